@@ -0,0 +1,101 @@
+# asset_cache.py
+import os
+import json
+import struct
+import zlib
+import hashlib
+import pygame
+import config
+from storage import atomic_write_bytes
+
+# ==============================================================================
+# CACHÉ DE ATLAS PRE-ESCALADOS
+# ==============================================================================
+# Cada personaje se guarda en un único archivo .atlas:
+#   MAGIC | largo del manifiesto (uint32) | manifiesto JSON | píxeles RGBA (zlib)
+# Los frames ya escalados son casi todo transparencia, así que en el atlas se
+# guarda solo el recorte visible de cada uno, empaquetado en estantes. El
+# manifiesto indica el tamaño de frame y, por frame, dónde está su recorte en
+# el atlas y dónde va dentro del frame. La clave combina el hash del
+# spritesheet con 'data' y 'animation_steps', así que el atlas se reconstruye
+# solo cuando alguno de ellos cambia. Los recortes se copian con
+# BLEND_RGBA_MAX sobre superficies vacías para no mezclar el alfa.
+ATLAS_MAGIC = b'DKATLAS2'
+ATLAS_WIDTH = 2048
+_HEADER = struct.Struct('<8sI')
+
+def _atlas_path(char_name):
+    safe_name = ''.join(c if c.isalnum() else '_' for c in char_name).lower()
+    return os.path.join(config.ASSET_CACHE_DIR, f"{safe_name}.atlas")
+
+def atlas_key(char_data):
+    digest = hashlib.sha1()
+    with open(char_data["sprite_sheet_path"], 'rb') as f: digest.update(f.read())
+    digest.update(json.dumps([char_data["data"], char_data.get("animation_steps", [])]).encode('utf-8'))
+    return digest.hexdigest()
+
+def load_baked_frames(char_name, char_data, key=None):
+    # Devuelve (animation_list, flipped_animation_list) o None si no hay atlas
+    # válido para este personaje.
+    try:
+        with open(_atlas_path(char_name), 'rb') as f: blob = f.read()
+        if key is None: key = atlas_key(char_data)
+        magic, manifest_len = _HEADER.unpack_from(blob)
+        if magic != ATLAS_MAGIC: return None
+        manifest = json.loads(blob[_HEADER.size:_HEADER.size + manifest_len])
+        if manifest["key"] != key: return None
+        pixels = zlib.decompress(blob[_HEADER.size + manifest_len:])
+    except (OSError, ValueError, KeyError, struct.error, zlib.error):
+        return None
+    atlas_w, atlas_h = manifest["width"], manifest["height"]
+    # Sin convert_alpha(): puede correr en un hilo del precargador (ver game.load_character_assets).
+    atlas = pygame.image.frombuffer(pixels, (atlas_w, atlas_h), 'RGBA')
+    flipped_atlas = pygame.transform.flip(atlas, True, False)
+    frame_w, frame_h = manifest["frame_w"], manifest["frame_h"]
+    animation_list, flipped_animation_list = [], []
+    for frames in manifest["frames"]:
+        row, flipped_row = [], []
+        for ax, ay, x, y, w, h in frames:
+            img = pygame.Surface((frame_w, frame_h), pygame.SRCALPHA)
+            flipped_img = pygame.Surface((frame_w, frame_h), pygame.SRCALPHA)
+            if w and h:
+                img.blit(atlas, (x, y), (ax, ay, w, h), pygame.BLEND_RGBA_MAX)
+                flipped_img.blit(flipped_atlas, (frame_w - x - w, y), (atlas_w - ax - w, ay, w, h), pygame.BLEND_RGBA_MAX)
+            row.append(img); flipped_row.append(flipped_img)
+        animation_list.append(row); flipped_animation_list.append(flipped_row)
+    return animation_list, flipped_animation_list
+
+def bake_frames(char_name, char_data, animation_list, key=None):
+    all_frames = [img for frames in animation_list for img in frames]
+    if not all_frames: return False
+    frame_w, frame_h = all_frames[0].get_size()
+    # Empaquetado por estantes: los recortes se colocan de izquierda a derecha
+    # y se abre un estante nuevo cuando no caben en el ancho del atlas.
+    atlas_w = max(ATLAS_WIDTH, frame_w)
+    placements, crops = [], []
+    shelf_x = shelf_y = shelf_h = 0
+    for frames in animation_list:
+        row = []
+        for img in frames:
+            bounds = img.get_bounding_rect()
+            if shelf_x + bounds.w > atlas_w:
+                shelf_x, shelf_y, shelf_h = 0, shelf_y + shelf_h, 0
+            row.append([shelf_x, shelf_y, bounds.x, bounds.y, bounds.w, bounds.h])
+            crops.append((img, bounds, shelf_x, shelf_y))
+            shelf_x += bounds.w; shelf_h = max(shelf_h, bounds.h)
+        placements.append(row)
+    atlas = pygame.Surface((atlas_w, max(1, shelf_y + shelf_h)), pygame.SRCALPHA)
+    for img, bounds, ax, ay in crops:
+        if bounds.w and bounds.h: atlas.blit(img, (ax, ay), bounds, pygame.BLEND_RGBA_MAX)
+    manifest = json.dumps({
+        "key": key if key is not None else atlas_key(char_data), "width": atlas.get_width(), "height": atlas.get_height(),
+        "frame_w": frame_w, "frame_h": frame_h, "frames": placements
+    }).encode('utf-8')
+    blob = _HEADER.pack(ATLAS_MAGIC, len(manifest)) + manifest + zlib.compress(pygame.image.tobytes(atlas, 'RGBA'))
+    try:
+        os.makedirs(config.ASSET_CACHE_DIR, exist_ok=True)
+        atomic_write_bytes(_atlas_path(char_name), blob)
+    except OSError as e:
+        print(f"ADVERTENCIA: No se pudo guardar el atlas de '{char_name}': {e}")
+        return False
+    return True
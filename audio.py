@@ -0,0 +1,147 @@
+# audio.py
+# Sonido del juego. Cada archivo de sonido se carga una vez (en los hilos del
+# precargador) y todos los personajes y movimientos que lo usan comparten el
+# mismo mixer.Sound. Cada luchador tiene sus propios canales reservados: si
+# están todos sonando, un golpe nuevo corta el de menor prioridad (o el más
+# antiguo) y, si todos pesan más, no suena. El volumen de música y de efectos
+# se aplica a los canales, sin tocar cada Sound. La música corta se decodifica
+# entera en memoria una vez; la larga se sigue leyendo de disco con mixer.music.
+import os
+import threading
+import pygame
+from pygame import mixer
+import config
+
+_sounds = {}
+_sounds_lock = threading.Lock()
+
+def load_sound(path):
+    # Puede llamarse desde varios hilos; si dos cargan el mismo archivo a la vez
+    # se queda el primero.
+    with _sounds_lock: sound = _sounds.get(path)
+    if sound is not None: return sound
+    sound = mixer.Sound(path)
+    with _sounds_lock: return _sounds.setdefault(path, sound)
+
+def load_character_sounds(char_data):
+    # {None: sonido del personaje, clave de movimiento: sonido propio}. Un
+    # movimiento puede tener su "sound_path"; si no, usa el del personaje.
+    sounds = {None: load_sound(char_data["sound_path"])}
+    for move_key, move in char_data.get("special_moves", {}).items():
+        if move.get("sound_path"): sounds[move_key] = load_sound(move["sound_path"])
+    return sounds
+
+def load_music(path):
+    return mixer.Sound(path)
+
+def move_priority(move):
+    # Los golpes que más dañan se oyen por encima de los flojos.
+    return move.get("sound_priority", move.get("damage", 10))
+
+
+class AudioMixer:
+    # Canal 0: música decodificada. Después, config.AUDIO_VOICES_PER_FIGHTER
+    # canales reservados por luchador (jugadores 1 y 2). El resto queda para
+    # los demás sonidos. No se usan Sound.play() ni find_channel(): el primero
+    # devuelve el volumen del canal al máximo y el segundo no respeta los
+    # canales reservados.
+    MUSIC_FADE_MS = 5000
+
+    def __init__(self):
+        self.ready = False
+        self.music_volume, self.fx_volume = 1.0, 1.0
+        self._voices, self._pool = {}, []
+        self._voice_info = {}  # canal -> (prioridad, ticks al empezar)
+        self._music_channel = None
+        self._music_path, self._music_pending = None, None
+        self._preloader = None
+
+    def init(self, preloader=None):
+        # Después de mixer.init(). Sin llamar a init() (benchmarks, simulador)
+        # no suena nada.
+        voices = config.AUDIO_VOICES_PER_FIGHTER
+        reserved = 1 + 2 * voices
+        channels = max(config.AUDIO_CHANNELS, reserved + 1)
+        mixer.set_num_channels(channels)
+        mixer.set_reserved(reserved)
+        self._music_channel = mixer.Channel(0)
+        self._voices = {player: [mixer.Channel(1 + (player - 1) * voices + i) for i in range(voices)] for player in (1, 2)}
+        self._pool = [mixer.Channel(index) for index in range(reserved, channels)]
+        self._preloader = preloader
+        self.ready = True
+        self.set_volumes(self.music_volume, self.fx_volume)
+
+    def set_volumes(self, music, fx):
+        self.music_volume, self.fx_volume = music, fx
+        if not self.ready: return
+        mixer.music.set_volume(music)
+        self._music_channel.set_volume(music)
+        for channel in self._fx_channels(): channel.set_volume(fx)
+
+    # --- efectos ---
+    def play(self, sound, owner=None, priority=0):
+        if not self.ready or sound is None: return
+        voices = self._voices.get(owner)
+        if voices is None:
+            channel = next((channel for channel in self._pool if not channel.get_busy()), None)
+            if channel is not None: channel.play(sound)
+            return
+        channel = self._pick_voice(voices, priority)
+        if channel is None: return
+        channel.play(sound)
+        self._voice_info[channel] = (priority, pygame.time.get_ticks())
+
+    def _pick_voice(self, voices, priority):
+        victim, victim_info = None, None
+        for channel in voices:
+            if not channel.get_busy(): return channel
+            info = self._voice_info.get(channel, (0, 0))
+            if victim is None or info < victim_info: victim, victim_info = channel, info
+        return victim if victim_info[0] <= priority else None
+
+    def _fx_channels(self):
+        for voices in self._voices.values(): yield from voices
+        yield from self._pool
+
+    # --- música ---
+    def preload_music(self, path):
+        # Solo se decodifica en memoria la música que cabe en config.MUSIC_DECODE_MAX_FILE.
+        if self._preloader is None: return False
+        try:
+            if os.path.getsize(path) > config.MUSIC_DECODE_MAX_FILE: return False
+        except OSError: return False
+        self._preloader.request(('music', path), load_music, path)
+        return True
+
+    def play_music(self, path):
+        # Si ya suena esa pista no se vuelve a cargar. Si se está decodificando
+        # se empieza en update() cuando esté lista; nunca se espera aquí.
+        if not self.ready or path == self._music_path: return
+        self.stop_music()
+        self._music_path = path
+        if self.preload_music(path): self._music_pending = path; self.update()
+        else: self._stream_music(path)
+
+    def update(self):
+        # Una vez por frame, después de preloader.poll().
+        path = self._music_pending
+        if path is None or not self._preloader.is_ready(('music', path)): return
+        self._music_pending = None
+        sound = self._preloader.get(('music', path))
+        if sound is not None: self._music_channel.play(sound, loops=-1, fade_ms=self.MUSIC_FADE_MS)
+        else: self._stream_music(path)
+
+    def _stream_music(self, path):
+        try:
+            mixer.music.load(path)
+            mixer.music.play(-1, 0.0, self.MUSIC_FADE_MS)
+        except pygame.error as e:
+            print(f"ADVERTENCIA: No se pudo reproducir la música '{path}': {e}")
+
+    def stop_music(self):
+        if not self.ready: return
+        self._music_channel.stop(); mixer.music.stop()
+        self._music_path, self._music_pending = None, None
+
+
+audio_mixer = AudioMixer()
@@ -1,30 +1,15 @@
 # auth.py
 import os
-import json
-import customtkinter as ctk
 from tkinter import messagebox, TclError
 import config
-from PIL import Image, ImageTk
-import threading
-import cv2
-import time
+from storage import UserRepository, get_backend
+from leaderboard import LeaderboardIndex
 
-ctk.set_appearance_mode('dark')
-ctk.set_default_color_theme('blue')
-
-def load_users():
-    if os.path.exists(config.USERS_FILE):
-        with open(config.USERS_FILE, 'r') as f:
-            return json.load(f)
-    return {}
-
-def save_users(users):
-    with open(config.USERS_FILE, 'w') as f:
-        json.dump(users, f, indent=4)
+user_repo = UserRepository(get_backend())
+leaderboard = LeaderboardIndex(user_repo)
 
 def register_user(username, correo, password, character_class):
-    users = load_users()
-    if username in users:
+    if user_repo.exists(username):
         return 'exists'
     if '@' not in correo:
         return 'invalid_email'
@@ -74,7 +59,7 @@ def register_user(username, correo, password, character_class):
         if password[i] in '._-,#' and password[i+1] in '._-,#':
             return 'mucho_caracteres_especiales'
 
-    users[username] = {
+    user_repo.add(username, {
         'password': password,
         'correo': correo,
         'character_class': character_class,
@@ -90,23 +75,21 @@ def register_user(username, correo, password, character_class):
             'matches_won': 0,
             'matches_lost': 0
         }
-    }
-    save_users(users)
+    })
+    user_repo.flush()
     return 'ok'
 
 def login_user(username, password):
-    users = load_users()
-    return username in users and users[username]['password'] == password
+    user = user_repo.get(username)
+    return user is not None and user['password'] == password
 
 def get_user(username):
-    users = load_users()
-    return users.get(username)
+    return user_repo.get(username)
 
 def delete_user(username):
-    users = load_users()
-    if username in users:
-        del users[username]
-        save_users(users)
+    if user_repo.delete(username):
+        leaderboard.remove(username)
+        user_repo.flush()
         return True
     return False
 
@@ -116,49 +99,29 @@ class AuthUI:
         self.current_user = None
         self.root = None
         self.is_running = True
+        self.video = None
 
-    def video_stream(self, canvas):
-        video_path = "assets/videos/login_bg.mp4"
+    def start_video(self, canvas):
+        video_path = config.LOGIN_VIDEO_PATH
         if not os.path.exists(video_path):
             print(f"Video no encontrado en {video_path}")
             return
-        
-        cap = cv2.VideoCapture(video_path)
-        image_item = None
-        
-        while self.is_running and cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-                continue
-
-            try:
-                if not self.root or not self.root.winfo_exists():
-                    break
-                
-                cv2image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                pil_img = Image.fromarray(cv2image)
-                pil_img = pil_img.resize((1280, 720), Image.Resampling.LANCZOS)
-                
-                imgtk = ImageTk.PhotoImage(image=pil_img)
-                
-                if image_item is None:
-                    image_item = canvas.create_image(0, 0, anchor='nw', image=imgtk)
-                else:
-                    canvas.itemconfig(image_item, image=imgtk)
-                
-                canvas.imgtk = imgtk
-
-            except (RuntimeError, TclError):
-                break
-            
-            time.sleep(0.033)
-        
-        cap.release()
+        # Solo se decodifica la parte visible del lienzo; si aún no tiene
+        # tamaño se usa el del vídeo escalado.
+        canvas.update_idletasks()
+        size = (canvas.winfo_width(), canvas.winfo_height())
+        if size[0] <= 1 or size[1] <= 1: size = config.LOGIN_VIDEO_SIZE
+        try:
+            from login_video import LoginVideo  # OpenCV solo se carga si hay vídeo
+            self.video = LoginVideo(self.root, canvas, video_path, size)
+        except (OSError, TclError) as e:
+            print(f"ADVERTENCIA: No se pudo iniciar el vídeo de fondo: {e}")
+            return
+        self.video.start()
 
     def on_closing(self):
         self.is_running = False
-        time.sleep(0.1)
+        if self.video: self.video.stop()
         if self.root:
             self.root.destroy()
 
@@ -167,6 +130,11 @@ class AuthUI:
         return self.current_user
 
     def iniciar_auth_screen(self):
+        # customtkinter se importa aquí y no al cargar el módulo: el juego y las
+        # herramientas usan auth sin necesitar la interfaz del login.
+        import customtkinter as ctk
+        ctk.set_appearance_mode('dark')
+        ctk.set_default_color_theme('blue')
         self.root = ctk.CTk()
         self.root.title('DARKHI GAME')
         self.root.geometry('1280x720')
@@ -180,8 +148,7 @@ class AuthUI:
         video_canvas = ctk.CTkCanvas(self.root, highlightthickness=0)
         video_canvas.pack(side="left", fill="both", expand=True)
 
-        video_thread = threading.Thread(target=self.video_stream, args=(video_canvas,), daemon=True)
-        video_thread.start()
+        self.root.after(0, lambda: self.start_video(video_canvas))
 
         login_frame = ctk.CTkFrame(side_panel, fg_color="transparent")
         
@@ -210,20 +177,24 @@ class AuthUI:
         
         ctk.CTkLabel(register_frame, text='Selecciona tu personaje').pack(pady=(15, 5))
         character_var = ctk.StringVar(value=None)
-        
-        try:
-            from game import load_characters
-            available_characters = load_characters()
-            for char_name in available_characters:
-                ctk.CTkRadioButton(register_frame, text=char_name, variable=character_var, value=char_name).pack(anchor='w', padx=100, pady=2)
-        except (FileNotFoundError, ImportError):
-            ctk.CTkLabel(register_frame, text="Error: No se encontró characters.json").pack()
+        characters_frame = ctk.CTkFrame(register_frame, fg_color="transparent")
+        characters_frame.pack(fill="x")
+
+        def load_character_options():
+            # Los personajes se leen al abrir el registro por primera vez.
+            try:
+                available_characters = get_backend().load_characters()
+                for char_name in available_characters:
+                    ctk.CTkRadioButton(characters_frame, text=char_name, variable=character_var, value=char_name).pack(anchor='w', padx=100, pady=2)
+            except (FileNotFoundError, ImportError):
+                ctk.CTkLabel(characters_frame, text="Error: No se encontró characters.json").pack()
 
         ctk.CTkButton(register_frame, text='Registrarse', command=lambda: registrar(), width=300, height=45).pack(pady=(20, 5), padx=40)
         ctk.CTkButton(register_frame, text='Volver al inicio de sesión', command=lambda: switch_view('login'), fg_color="transparent", text_color=("gray70", "gray60"), hover_color=("#2B2B2B", "#2B2B2B")).pack(pady=5, padx=40)
 
         def switch_view(view):
             if view == 'register':
+                if not characters_frame.winfo_children(): load_character_options()
                 login_frame.pack_forget()
                 register_frame.pack(expand=True, fill="both")
             else:
@@ -0,0 +1,107 @@
+# background.py
+# Fondos de mapa animados (GIF u otro formato animado que abra PIL).
+# pygame.image.load solo lee el primer frame; aquí un hilo decodifica los
+# frames con PIL, los escala a la resolución actual, los convierte al formato
+# de pantalla y los deja en un búfer circular (una cola acotada) del que
+# ui.draw_bg saca el frame que toca según el tiempo. La memoria no depende de
+# los frames del GIF: como mucho config.ANIMATED_BG_FRAMES frames escalados.
+# Si el GIF entero cabe en el búfer se decodifica una vez y se reutiliza.
+# El hilo no toca el display: convert() se hace en el hilo principal al sacar
+# cada frame del búfer.
+# PIL se importa al abrir el primer fondo, no al cargar el módulo.
+import queue
+import threading
+import pygame
+import config
+
+_DEFAULT_FRAME_MS = 100
+_MIN_FRAME_MS = 20
+
+def is_animated(path):
+    from PIL import Image
+    with Image.open(path) as image: return getattr(image, 'is_animated', False)
+
+def _to_surface(image):
+    return pygame.image.frombuffer(image.tobytes(), image.size, 'RGB')
+
+
+class AnimatedBackground:
+    def __init__(self, path, capacity=config.ANIMATED_BG_FRAMES):
+        from PIL import Image
+        self.path, self.capacity = path, capacity
+        with Image.open(path) as image:
+            self.frame_count = getattr(image, 'n_frames', 1)
+            self.first_frame = _to_surface(image.convert('RGB'))  # sin escalar, mientras llega el primero
+        self.size = None
+        self._frames, self._stop = None, None
+        self._current, self._current_end = None, 0
+        self._cached = None  # (tamaño, frames) si el GIF entero cabe en el búfer
+        self._converted = {}  # frame decodificado -> frame en formato de pantalla (si cabe entero)
+
+    def start(self, size):
+        # Arranca la decodificación para 'size'; con otro tamaño se descarta
+        # lo decodificado y se empieza de nuevo.
+        size = (int(size[0]), int(size[1]))
+        if size == self.size: return
+        self.stop()
+        self.size = size
+        self._frames, self._stop = queue.Queue(maxsize=self.capacity), threading.Event()
+        self._converted = {}
+        if self._cached is not None and self._cached[0] != size: self._cached = None
+        threading.Thread(target=self._decode, args=(size, self._frames, self._stop), name='background', daemon=True).start()
+
+    def stop(self):
+        if self._stop is not None: self._stop.set()
+        self.size, self._frames, self._stop = None, None, None
+        self._current, self._current_end = None, 0
+
+    def _decoded_frames(self, image, size):
+        from PIL import Image
+        decoded = [] if self.frame_count <= self.capacity else None
+        for index in range(self.frame_count):
+            image.seek(index)
+            item = (_to_surface(image.convert('RGB').resize(size, Image.Resampling.NEAREST)),
+                    max(image.info.get('duration') or _DEFAULT_FRAME_MS, _MIN_FRAME_MS))
+            if decoded is not None: decoded.append(item)
+            yield item
+        if decoded is not None: self._cached = (size, decoded)
+
+    def _decode(self, size, frames, stop):
+        from PIL import Image
+        try:
+            with Image.open(self.path) as image:
+                while not stop.is_set():
+                    cached = self._cached
+                    items = cached[1] if cached is not None and cached[0] == size else self._decoded_frames(image, size)
+                    for item in items:
+                        # Con el búfer lleno el hilo espera a que se consuma un frame.
+                        while True:
+                            if stop.is_set(): return
+                            try: frames.put(item, timeout=0.1); break
+                            except queue.Full: pass
+        except Exception as e:
+            print(f"ADVERTENCIA: No se pudo decodificar el fondo animado '{self.path}': {e}")
+
+    def frame(self, size):
+        # Frame que toca ahora a tamaño 'size'. Si el hilo va retrasado se
+        # repite el actual; si el dibujo se retrasó no se intenta recuperar el
+        # tiempo perdido.
+        self.start(size)
+        now = pygame.time.get_ticks()
+        latest = None  # solo se convierte el frame que se va a mostrar
+        while (self._current is None and latest is None) or now >= self._current_end:
+            try: latest, duration = self._frames.get_nowait()
+            except queue.Empty: break
+            start = self._current_end if self._current is not None and now - self._current_end < duration else now
+            self._current_end = start + duration
+        if latest is not None: self._current = self._display_surface(latest)
+        return self._current if self._current is not None else self._display_surface(self.first_frame)
+
+    def _display_surface(self, surface):
+        # Solo desde el hilo principal. Los frames de un GIF que cabe entero en el
+        # búfer se convierten una vez; los demás, cada vez que salen del búfer.
+        converted = self._converted.get(surface)
+        if converted is None:
+            converted = surface.convert()
+            if self.frame_count <= self.capacity or surface is self.first_frame: self._converted[surface] = converted
+        return converted
@@ -0,0 +1,295 @@
+# batch_simulation.py
+import copy
+import itertools
+import numpy as np
+import config
+from simulation import (FighterCore, SPAWN_POSITIONS, SPAWN_Y, FIGHTER_SIZE, ROLL_PLAYER_MUL, ROLL_TICK_MUL,
+                        MASK64, match_seed, simulate_match, build_report)
+from collision import CharacterBoxes, uses_projectiles
+
+# ==============================================================================
+# MOTOR VECTORIZADO
+# ==============================================================================
+# Mismas reglas que FighterCore con la IA del simulador, pero con el estado de
+# muchos combates independientes en arrays de forma (combate, jugador) que se
+# avanzan todos a la vez. Dentro de un tick el jugador 1 se mueve antes que el
+# 2, igual que en simulate_match, así que los resultados coinciden combate a
+# combate con el motor escalar (ver verify_against_scalar).
+
+def _mix64(x):
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+def supports(char_data):
+    # Solo las colisiones clásicas: rect entero y golpe instantáneo.
+    return CharacterBoxes.from_character(char_data) is None and not uses_projectiles(char_data)
+
+def _frame_counts(char_data):
+    frame_counts = list(char_data.get("animation_steps", []))
+    if not frame_counts: frame_counts = [1]
+    elif not frame_counts[0]: frame_counts[0] = 1
+    return frame_counts
+
+
+class BatchMatches:
+    # Estado por luchador; se compacta quitando los combates ya terminados.
+    STATE = ('x', 'y', 'vel_y', 'jump_state', 'attacking', 'attack_type', 'attack_cooldown', 'hit',
+             'health', 'alive', 'flip', 'action', 'frame_index', 'anim_ticks',
+             'speed', 'frame_counts', 'n_moves', 'move_damage', 'move_cooldown', 'move_row',
+             'uses', 'hits', 'damage', 'seeds', 'ids')
+
+    def __init__(self, matchups, seeds, arena=None):
+        # matchups: lista de (datos del jugador 1, datos del jugador 2)
+        count = len(matchups)
+        self.screen_width, self.screen_height = arena or config.RESOLUTIONS[0]
+        # Una fila de parámetros por personaje distinto; cada combate los toma
+        # por índice en vez de rellenarse uno a uno.
+        templates, slot_of = [], {}
+        index = np.zeros((count, 2), dtype=np.int64)
+        for i, pair in enumerate(matchups):
+            for p, data in enumerate(pair):
+                slot = slot_of.get(id(data))
+                if slot is None:
+                    if not supports(data): raise ValueError("el motor vectorizado no soporta hitboxes/hurtboxes ni proyectiles")
+                    slot = slot_of[id(data)] = len(templates); templates.append(data)
+                index[i, p] = slot
+        rows = max(len(_frame_counts(data)) for data in templates)
+        slots = max([len(data.get("special_moves", {})) for data in templates] + [1])
+        frame_counts = np.zeros((len(templates), rows), dtype=np.int64)
+        speed = np.zeros(len(templates), dtype=np.int64); health = np.zeros(len(templates), dtype=np.int64)
+        n_moves = np.zeros(len(templates), dtype=np.int64)
+        move_damage, move_cooldown, move_row = (np.zeros((len(templates), slots), dtype=np.int64) for _ in range(3))
+        for t, data in enumerate(templates):
+            counts = _frame_counts(data)
+            frame_counts[t, :len(counts)] = counts
+            stats = data.get("stats", {})
+            speed[t] = stats.get('speed', 10); health[t] = stats.get('health', 100)
+            moves = list(data.get("special_moves", {}).values())
+            n_moves[t] = len(moves)
+            for k, move in enumerate(moves):
+                move_damage[t, k] = move.get("damage", 10)
+                move_cooldown[t, k] = move.get("cooldown", 20)
+                move_row[t, k] = move["animation_row"]
+        self.frame_counts, self.speed, self.health, self.n_moves = frame_counts[index], speed[index], health[index], n_moves[index]
+        self.move_damage, self.move_cooldown, self.move_row = move_damage[index], move_cooldown[index], move_row[index]
+
+        self.x = np.tile(np.array(SPAWN_POSITIONS, dtype=np.int64), (count, 1))
+        self.y = np.full((count, 2), SPAWN_Y, dtype=np.int64)
+        self.vel_y = np.zeros((count, 2), dtype=np.int64)
+        self.jump_state = np.zeros((count, 2), dtype=bool)
+        self.attacking = np.zeros((count, 2), dtype=bool)
+        self.attack_type = np.zeros((count, 2), dtype=np.int64)
+        self.attack_cooldown = np.zeros((count, 2), dtype=np.int64)
+        self.hit = np.zeros((count, 2), dtype=bool)
+        self.alive = np.ones((count, 2), dtype=bool)
+        self.flip = np.tile(np.array([False, True]), (count, 1))
+        self.action = np.zeros((count, 2), dtype=np.int64)
+        self.frame_index = np.zeros((count, 2), dtype=np.int64)
+        self.anim_ticks = np.zeros((count, 2), dtype=np.int64)
+        self.uses = np.zeros((count, 2, slots), dtype=np.int64)
+        self.hits = np.zeros((count, 2, slots), dtype=np.int64)
+        self.damage = np.zeros((count, 2, slots), dtype=np.int64)
+        self.seeds = np.array(seeds, dtype=np.uint64)
+        self.ids = np.arange(count)
+        self.tick = 0
+
+        # Resultados por combate, en el orden de 'matchups'.
+        self.winner = np.full(count, -1, dtype=np.int64)  # 0, 1 o -1 si empate
+        self.ticks = np.zeros(count, dtype=np.int64)
+        self.final_health = np.zeros((count, 2), dtype=np.int64)
+        self.final_uses = np.zeros((count, 2, slots), dtype=np.int64)
+        self.final_hits = np.zeros((count, 2, slots), dtype=np.int64)
+        self.final_damage = np.zeros((count, 2, slots), dtype=np.int64)
+
+    def _move(self, p, q):
+        width, height = FIGHTER_SIZE
+        x, y = self.x[:, p], self.y[:, p]
+        center_x, target_x = x + width // 2, self.x[:, q] + width // 2
+        can_act = ~self.attacking[:, p] & self.alive[:, p]
+        speed = self.speed[:, p]
+        dx = np.where(center_x < target_x - 30, speed, np.where(center_x > target_x + 30, -speed, 0)) * can_act
+        fire = can_act & (np.abs(center_x - target_x) < 150) & (self.n_moves[:, p] > 0) & (self.attack_cooldown[:, p] == 0)
+        if fire.any():
+            f = np.flatnonzero(fire)
+            offset = np.uint64(((p + 1) * ROLL_PLAYER_MUL + self.tick * ROLL_TICK_MUL) & MASK64)
+            roll = _mix64(self.seeds[f] + offset)
+            k = (roll % self.n_moves[f, p].astype(np.uint64)).astype(np.int64)
+            dmg = self.move_damage[f, p, k]
+            self.attacking[f, p] = True
+            self.attack_type[f, p] = self.move_row[f, p, k]
+            left = center_x[f] - 2 * width * self.flip[f, p]
+            target_left, target_y = self.x[f, q], self.y[f, q]
+            landed = ((left < target_left + width) & (target_left < left + 2 * width)
+                      & (y[f] < target_y + height) & (target_y < y[f] + height))
+            h = f[landed]
+            self.health[h, q] -= dmg[landed]
+            self.hit[h, q] = True
+            self.uses[f, p, k] += 1
+            self.hits[h, p, k[landed]] += 1
+            self.damage[h, p, k[landed]] += dmg[landed]
+            self.attack_cooldown[f, p] = self.move_cooldown[f, p, k]
+        self.vel_y[:, p] += 2
+        dy = self.vel_y[:, p].copy()
+        dx = np.where(x + dx < 0, -x, dx)
+        dx = np.where(x + width + dx > self.screen_width, self.screen_width - x - width, dx)
+        floor = self.screen_height - 110
+        grounded = y + height + dy > floor
+        self.vel_y[grounded, p] = 0; self.jump_state[grounded, p] = False
+        dy = np.where(grounded, floor - y - height, dy)
+        self.flip[:, p] = target_x < center_x
+        cooldown = self.attack_cooldown[:, p]
+        cooldown -= cooldown > 0
+        x += dx; y += dy
+
+    def _update(self):
+        dead = self.health <= 0
+        self.health[dead] = 0; self.alive[dead] = False
+        new_action = np.select([dead, self.hit, self.attacking, self.jump_state], [6, 5, self.attack_type, 2], 0)
+        self._set_action(new_action)
+        rows = self.frame_counts.shape[2]
+        valid = self.action < rows
+        frames = np.take_along_axis(self.frame_counts, np.minimum(self.action, rows - 1)[..., None], axis=2)[..., 0]
+        frames = np.where(valid, frames, 0)
+        ok = frames > 0
+        self._set_action(np.where(ok, self.action, 0))
+        over = ok & (self.frame_index >= frames)
+        self.frame_index = np.where(over & ~self.alive, frames - 1, np.where(over, 0, self.frame_index))
+        clear = over & self.alive
+        self.attacking[clear] = False; self.hit[clear] = False
+        self.anim_ticks += ok
+        advance = ok & (self.anim_ticks >= FighterCore.ANIMATION_TICKS)
+        self.frame_index += advance
+        self.anim_ticks[advance] = 0
+
+    def _set_action(self, new_action):
+        changed = new_action != self.action
+        self.action = np.where(changed, new_action, self.action)
+        self.frame_index[changed] = 0; self.anim_ticks[changed] = 0
+
+    def _finish(self, done):
+        ids = self.ids[done]
+        alive = self.alive[done]
+        self.winner[ids] = np.where(alive[:, 0] & ~alive[:, 1], 0, np.where(alive[:, 1] & ~alive[:, 0], 1, -1))
+        self.ticks[ids] = self.tick
+        self.final_health[ids] = self.health[done]
+        self.final_uses[ids] = self.uses[done]; self.final_hits[ids] = self.hits[done]; self.final_damage[ids] = self.damage[done]
+        keep = ~done
+        for name in self.STATE: setattr(self, name, getattr(self, name)[keep])
+
+    def run(self, max_ticks=None):
+        if max_ticks is None: max_ticks = config.SIM_MAX_MATCH_SECONDS * config.SIM_TICK_RATE
+        while len(self.ids) and self.tick < max_ticks:
+            self.tick += 1
+            self._move(0, 1); self._move(1, 0)
+            self._update()
+            done = ~self.alive[:, 0] | ~self.alive[:, 1]
+            if done.any(): self._finish(done)
+        if len(self.ids): self._finish(np.ones(len(self.ids), dtype=bool))
+        return self
+
+# ==============================================================================
+# PAREJAS, BARRIDOS Y VERIFICACIÓN
+# ==============================================================================
+def _pairing_schedule(characters, matches_per_pair, seed):
+    # Mismo reparto que simulation.simulate_pairing: lados alternos y la misma
+    # semilla por combate.
+    schedule = []
+    for name_a, name_b in itertools.combinations(list(characters), 2):
+        for i in range(matches_per_pair):
+            first, second = (name_a, name_b) if i % 2 == 0 else (name_b, name_a)
+            schedule.append(((name_a, name_b), first, second, match_seed(seed, name_a, name_b, i)))
+    return schedule
+
+def _run_chunked(matchups, seeds, arena=None, batch_size=None):
+    if batch_size is None: batch_size = config.SIM_BATCH_SIZE
+    for start in range(0, len(matchups), batch_size):
+        yield start, BatchMatches(matchups[start:start + batch_size], seeds[start:start + batch_size], arena).run()
+
+def run_balance_batch(characters, matches_per_pair, seed=0, arena=None):
+    # Equivalente vectorizado de simulation.run_balance, con el mismo informe.
+    schedule = _pairing_schedule(characters, matches_per_pair, seed)
+    matchups = [(characters[first], characters[second]) for _, first, second, _ in schedule]
+    results = {}
+    for pair in itertools.combinations(list(characters), 2):
+        results[pair] = {"pair": list(pair), "matches": 0, "wins": {pair[0]: 0, pair[1]: 0}, "draws": 0, "ticks": 0,
+                         "moves": {pair[0]: {}, pair[1]: {}}}
+    for start, batch in _run_chunked(matchups, [entry[3] for entry in schedule], arena):
+        for j in range(len(batch.ticks)):
+            pair, first, second, _ = schedule[start + j]
+            result = results[pair]
+            result["matches"] += 1; result["ticks"] += int(batch.ticks[j])
+            if batch.winner[j] < 0: result["draws"] += 1
+            else: result["wins"][(first, second)[batch.winner[j]]] += 1
+            for p, name in enumerate((first, second)):
+                totals = result["moves"][name]
+                for k, key in enumerate(characters[name].get("special_moves", {})):
+                    entry = totals.setdefault(key, [0, 0, 0])
+                    entry[0] += int(batch.final_uses[j, p, k]); entry[1] += int(batch.final_hits[j, p, k]); entry[2] += int(batch.final_damage[j, p, k])
+    return build_report(list(characters), list(results.values()))
+
+def with_stats(char_data, health=None, speed=None, cooldown_scale=None):
+    variant = copy.deepcopy(char_data)
+    stats = variant.setdefault("stats", {})
+    if health is not None: stats["health"] = int(health)
+    if speed is not None: stats["speed"] = int(speed)
+    if cooldown_scale is not None:
+        for move in variant.get("special_moves", {}).values():
+            move["cooldown"] = max(1, round(move.get("cooldown", 20) * cooldown_scale))
+    return variant
+
+def sweep(characters, matches_per_pair, health_values=None, speed_values=None, cooldown_scales=None, seed=0, arena=None):
+    # Para cada personaje y cada punto de la malla salud x velocidad x escala
+    # de cooldown, juega contra todos los demás (sin modificar) y devuelve su
+    # tasa de victorias. Los ejes no indicados conservan el valor original.
+    points = list(itertools.product(health_values or [None], speed_values or [None], cooldown_scales or [None]))
+    names = list(characters)
+    schedule, matchups, seeds = [], [], []
+    for subject in names:
+        for point in points:
+            variant = with_stats(characters[subject], *point)
+            for rival in names:
+                if rival == subject: continue
+                for i in range(matches_per_pair):
+                    subject_side = i % 2
+                    pair = (variant, characters[rival]) if subject_side == 0 else (characters[rival], variant)
+                    schedule.append(((subject, point), subject_side)); matchups.append(pair)
+                    seeds.append(match_seed(seed, 'sweep', subject, *point, rival, i))
+    totals = {}
+    for start, batch in _run_chunked(matchups, seeds, arena):
+        for j in range(len(batch.ticks)):
+            key, subject_side = schedule[start + j]
+            entry = totals.setdefault(key, [0, 0, 0, 0])  # combates, victorias, empates, ticks
+            entry[0] += 1; entry[3] += int(batch.ticks[j])
+            if batch.winner[j] == subject_side: entry[1] += 1
+            elif batch.winner[j] < 0: entry[2] += 1
+    rows = []
+    for (subject, (health, speed, cooldown_scale)), (matches, wins, draws, ticks) in totals.items():
+        stats = characters[subject].get("stats", {})
+        rows.append({
+            "character": subject,
+            "health": health if health is not None else stats.get("health", 100),
+            "speed": speed if speed is not None else stats.get("speed", 10),
+            "cooldown_scale": cooldown_scale if cooldown_scale is not None else 1.0,
+            "matches": matches, "win_rate": wins / matches if matches else 0.0, "draws": draws,
+            "avg_match_seconds": ticks / config.SIM_TICK_RATE / matches if matches else 0.0
+        })
+    return rows
+
+def verify_against_scalar(characters, matches_per_pair, seed=0, arena=None):
+    # Juega los mismos combates con ambos motores y devuelve las diferencias
+    # (ganador, duración, salud final o estadísticas por movimiento).
+    schedule = _pairing_schedule(characters, matches_per_pair, seed)
+    matchups = [(characters[first], characters[second]) for _, first, second, _ in schedule]
+    mismatches = []
+    for start, batch in _run_chunked(matchups, [entry[3] for entry in schedule], arena):
+        for j in range(len(batch.ticks)):
+            _, first, second, match_seed_j = schedule[start + j]
+            winner, ticks, f1, f2 = simulate_match(first, characters[first], second, characters[second], match_seed_j, arena)
+            expected = ((first, second).index(winner) if winner is not None else -1, ticks, [f1.health, f2.health],
+                        [[f.move_stats[key] for key in f.move_keys] for f in (f1, f2)])
+            got = (int(batch.winner[j]), int(batch.ticks[j]), batch.final_health[j].tolist(),
+                   [[[int(batch.final_uses[j, p, k]), int(batch.final_hits[j, p, k]), int(batch.final_damage[j, p, k])]
+                     for k in range(len(f.move_keys))] for p, f in enumerate((f1, f2))])
+            if expected != got: mismatches.append({"match": [first, second], "seed": match_seed_j, "scalar": expected, "batch": got})
+    return len(schedule), mismatches
@@ -0,0 +1,360 @@
+# benchmark.py
+# Banco de pruebas de rendimiento: dibujo de cada ui.draw_* en todas las
+# resoluciones, bucle de pasos de Fighter, carga/guardado de usuarios con
+# archivos sintéticos, guardado del resultado de una partida, carga/creación de spritesheets
+# y un frame de combate con cada renderizador (software y texturas).
+# Corre con los drivers SDL 'dummy' (sin ventana ni sonido) y guarda los
+# resultados en JSON para comparar ejecuciones.
+# Uso: python benchmark.py [--quick] [--compare benchmarks/anterior.json]
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+import sys
+import time
+import random
+import shutil
+import platform
+import argparse
+import tempfile
+import statistics
+from contextlib import contextmanager
+from datetime import datetime
+import pygame
+import config
+import ui
+import render
+import storage
+from storage import JsonBackend, SQLiteBackend, UserRepository, atomic_write_json, read_json_file, run_in_writer
+from leaderboard import LeaderboardIndex
+from simulation import MatchState
+from collision import Projectile
+from audio import audio_mixer, load_character_sounds
+
+BENCH_GROUPS = ('ui', 'fighter', 'render', 'storage', 'assets')
+USER_COUNTS = (1000, 10000, 100000, 1000000)
+QUICK_USER_COUNTS = (1000, 10000)
+MATCH_USER_COUNT = 1000  # usuarios del backend temporal de commit_match_result
+
+# ==============================================================================
+# MEDICIÓN
+# ==============================================================================
+def measure(fn, repeat=5, min_run_time=0.05, max_number=10000):
+    # Como timeit.autorange: repite 'fn' hasta que una tanda dura al menos
+    # 'min_run_time' y luego toma 'repeat' tandas. Devuelve ms por llamada.
+    fn()
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number): fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_run_time or number >= max_number: break
+        number = min(max_number, number * 10 if elapsed < min_run_time / 10 else number * 2)
+    runs = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number): fn()
+        runs.append((time.perf_counter() - start) / number)
+    runs = [run * 1000 for run in runs]
+    return {"min_ms": min(runs), "median_ms": statistics.median(runs), "calls": number, "repeat": repeat}
+
+def measure_once(setup, fn, repeat=3):
+    # Para operaciones largas o con efectos (guardar 1M de usuarios): una
+    # llamada por tanda, con 'setup' fuera del tiempo medido.
+    runs = []
+    for _ in range(repeat):
+        state = setup()
+        start = time.perf_counter()
+        fn(state)
+        runs.append((time.perf_counter() - start) * 1000)
+    return {"min_ms": min(runs), "median_ms": statistics.median(runs), "calls": 1, "repeat": repeat}
+
+@contextmanager
+def _in_directory(path):
+    previous = os.getcwd()
+    os.chdir(path)
+    try: yield path
+    finally: os.chdir(previous)
+
+@contextmanager
+def _using_backend(backend):
+    # commit_match_result usa get_backend() y el user_repo/leaderboard de game;
+    # se apuntan a un backend temporal para no tocar los datos reales.
+    import game
+    previous = storage._backend, game.user_repo, game.leaderboard
+    storage._backend = backend
+    game.user_repo = UserRepository(backend); game.leaderboard = LeaderboardIndex(game.user_repo)
+    try: yield game.user_repo
+    finally: storage._backend, game.user_repo, game.leaderboard = previous
+
+# ==============================================================================
+# DATOS SINTÉTICOS
+# ==============================================================================
+def synthetic_users(count, seed=0):
+    rng = random.Random(seed)
+    users = {}
+    for i in range(count):
+        lp = rng.randrange(0, 800)
+        rank = next(r['name'] for r in reversed(config.RANKS) if lp >= r['lp_required'])
+        users[f"jugador{i:07d}"] = {
+            'password': f"pw{i % 100000:05d}", 'correo': f"jugador{i:07d}@gmail.com",
+            'character_class': rng.choice(['Guerrero', 'Mago']), 'currency': rng.randrange(0, 5000),
+            'stats': {'health': 100, 'attacks_done': rng.randrange(0, 500), 'is_alive': True},
+            'daily_missions': {'last_updated': '2026-01-01', 'missions': [
+                {'id': f"m{slot}", 'progress': rng.randrange(0, 5), 'completed': False, 'claimed': False} for slot in range(3)]},
+            'profile_stats': {'play_time_seconds': rng.randrange(0, 100000), 'matches_played': 10, 'matches_won': 5, 'matches_lost': 5},
+            'ranked_stats': {'league_points': lp, 'rank': rank}}
+    return users
+
+def synthetic_sprite_folders(base_path, frame_size=(162, 162), frames_per_animation=8):
+    from PIL import Image
+    for anim_name in ['Idle', 'Run', 'Jump', 'Fall', 'Attack', 'Take Hit', 'Death', 'Block', 'Hold Shield']:
+        anim_path = os.path.join(base_path, anim_name)
+        os.makedirs(anim_path, exist_ok=True)
+        for i in range(frames_per_animation):
+            Image.new('RGBA', frame_size, (40 * i % 256, 80, 160, 255)).save(os.path.join(anim_path, f"{i:02d}.png"))
+
+# ==============================================================================
+# GRUPOS
+# ==============================================================================
+def _load_game_assets():
+    from game import Game
+    characters = JsonBackend().load_characters()
+    char_name, char_data = next((name, data) for name, data in characters.items() if os.path.exists(data.get("sprite_sheet_path", '')))
+    sheet = pygame.image.load(char_data["sprite_sheet_path"]).convert_alpha()
+    animation_list, flipped = Game._load_from_spritesheet(char_data, sheet)
+    sounds = load_character_sounds(char_data) if os.path.exists(char_data.get("sound_path", '')) else {}
+    return characters, char_name, char_data, sheet, animation_list, flipped, sounds
+
+def _make_fighter(player, char_name, char_data, animation_list, flipped, sounds, x, flip, ai=True):
+    from fighter import Fighter
+    return Fighter(player, x, 310, flip, char_data["data"], animation_list, sounds, char_data.get("stats", {}),
+                   char_data.get("special_moves", {}), ai=ai, username=char_name, flipped_animation_list=flipped, save_state=False)
+
+def _ui_cases(screen, assets):
+    characters, char_name, char_data, _, animation_list, flipped, sounds = assets
+    bg = pygame.image.load(config.BG_IMG_PATH).convert()
+    victory = pygame.image.load(config.VICTORY_IMG_PATH).convert_alpha()
+    thumbnails = {}
+    for name, data in config.MAPS.items():
+        # Igual que Game: gris si falta la miniatura, así el caso sigue midiendo el dibujo.
+        try: thumbnails[name] = pygame.image.load(data['thumbnail']).convert()
+        except (FileNotFoundError, pygame.error):
+            thumbnails[name] = pygame.Surface((220, 165)); thumbnails[name].fill(config.GRAY)
+    score_font = ui.get_font(30, config.FONT_PATH)
+    menu_font, title_font = ui.get_font(48), ui.get_font(72)
+    preview = _make_fighter(1, char_name, char_data, animation_list, flipped, sounds, screen.get_width() * 0.7 - 40, False)
+    missions = [{'info': {'description': f"Gana {i + 2} combates", 'reward': 100, 'target': 5},
+                 'progress': {'progress': i, 'completed': i == 2, 'claimed': i == 1}} for i in range(3)]
+    players = [{'name': f"jugador{i}", 'rank': config.RANKS[i % len(config.RANKS)]['name'], 'lp': 800 - i * 50} for i in range(10)]
+    history = [{'timestamp': '2026-01-01 12:00:00', 'p1_char': 'Guerrero', 'p2_char': 'Mago', 'winner': 'Mago'} for _ in range(config.BATTLE_HISTORY_LIMIT)]
+    mission_master = {f"m{i}": {'description': "Usa ataques especiales durante los combates de hoy"} for i in range(8)}
+    projectile = Projectile(3, preview, "K_f", {"damage": 30, "projectile": {}})
+    summary = {'fps': 60, 'p50': 16.6, 'p95': 17.1, 'p99': 20.3, 'max': 25.0, 'phases': [('dibujo', 3.2), ('simulacion', 0.8), ('eventos', 0.1)]}
+    return {
+        'draw_text': lambda: ui.draw_text(screen, "Texto de prueba", menu_font, config.WHITE, 10, 10),
+        'draw_bg': lambda: ui.draw_bg(screen, bg),
+        'draw_health_bar': lambda: ui.draw_health_bar(screen, 70, 20, 20),
+        'draw_projectile': lambda: ui.draw_projectile(screen, projectile, 0.5),
+        'draw_sprite': lambda: ui.draw_sprite(screen, animation_list[0][0], flipped[0][0], True, (100, 100)),
+        'draw_loading_indicator': lambda: ui.draw_loading_indicator(screen, score_font, 0.5),
+        'draw_profiler_overlay': lambda: ui.draw_profiler_overlay(screen, ui.get_font(22), summary),
+        'draw_menu': lambda: ui.draw_menu(screen, menu_font, config.MENU_ITEMS, 0),
+        'draw_ajustes': lambda: ui.draw_ajustes(screen, menu_font, config.AJUSTES_ITEMS, 0, {'Resolución': '800x600', 'Volumen Música': '5', 'Volumen FX': '5'}),
+        'draw_profile_screen': lambda: ui.draw_profile_screen(screen, title_font, menu_font, "jugador", {'matches_played': 10, 'matches_won': 6, 'matches_lost': 4}, "1h 20m", animation_list[0][0]),
+        'draw_daily_missions': lambda: ui.draw_daily_missions(screen, bg, score_font, title_font, missions, 0, 1200),
+        'draw_round_over_menu': lambda: ui.draw_round_over_menu(screen, menu_font, config.ROUND_OPTIONS, 0, victory, 15),
+        'draw_leaderboard': lambda: ui.draw_leaderboard(screen, title_font, menu_font, players, 3),
+        'draw_map_select': lambda: ui.draw_map_select(screen, title_font, menu_font, config.MAPS, thumbnails, 0),
+        'draw_character_crud': lambda: ui.draw_character_crud(screen, bg, menu_font, title_font, list(characters), config.CRUD_MENU_ITEMS, 0, 0),
+        'draw_move_crud': lambda: ui.draw_move_crud(screen, bg, menu_font, title_font, char_name, char_data.get("special_moves", {}), 0, False),
+        'draw_character_select': lambda: ui.draw_character_select(screen, bg, menu_font, title_font, list(characters), 0, preview),
+        'draw_battle_history': lambda: ui.draw_battle_history(screen, bg, score_font, title_font, history, 0),
+        'draw_user_crud_screen': lambda: ui.draw_user_crud_screen(screen, bg, menu_font, title_font, [f"jugador{i}" for i in range(8)], 0, 0),
+        'draw_mission_crud_screen': lambda: ui.draw_mission_crud_screen(screen, bg, menu_font, title_font, mission_master, 0, 0),
+    }
+
+def bench_ui(results, args, assets):
+    covered = set()
+    for resolution in config.RESOLUTIONS:
+        screen = pygame.display.set_mode(resolution)
+        ui.clear_surface_cache()
+        for name, fn in _ui_cases(screen, assets).items():
+            covered.add(name)
+            results[f"ui.{name}@{resolution[0]}x{resolution[1]}"] = measure(fn, repeat=args.repeat)
+    missing = sorted(name for name in dir(ui) if name.startswith('draw_') and callable(getattr(ui, name)) and name not in covered)
+    for name in missing: print(f"ADVERTENCIA: ui.{name} no tiene caso en el benchmark.")
+
+def bench_fighter(results, args, assets):
+    _, char_name, char_data, _, animation_list, flipped, sounds = assets
+    screen = pygame.display.set_mode(config.RESOLUTIONS[0])
+    ticks = config.SIM_TICK_RATE * 10
+
+    def step_loop():
+        fighter_1 = _make_fighter(1, char_name, char_data, animation_list, flipped, sounds, 200, False)
+        fighter_2 = _make_fighter(2, char_name, char_data, animation_list, flipped, sounds, 700, True)
+        match = MatchState(fighter_1, fighter_2, screen.get_size())
+        match.intro_count = 0
+        for _ in range(ticks): match.step(0)
+
+    result = measure(step_loop, repeat=args.repeat, min_run_time=0.2)
+    result["ticks_per_call"] = ticks
+    results["fighter.step_loop_10s"] = result
+    fighter = _make_fighter(1, char_name, char_data, animation_list, flipped, sounds, 200, False)
+    results["fighter.draw"] = measure(lambda: fighter.draw(screen, 0.5), repeat=args.repeat)
+    if audio_mixer.ready:
+        # Con los canales del luchador ocupados: cada llamada corta uno.
+        move_key = next(iter(fighter.special_moves))
+        results["fighter.attack_sound"] = measure(lambda: fighter.on_attack(move_key, 0), repeat=args.repeat)
+
+def bench_render(results, args, assets):
+    # Frame de combate completo (fondo a pantalla completa, barras, textos y
+    # dos luchadores) más la presentación, con cada renderizador disponible.
+    # Con el driver 'dummy' solo hay 'software' y 'gpu_software'; con
+    # SDL_VIDEODRIVER real también se mide 'gpu'.
+    _, char_name, char_data, _, animation_list, flipped, sounds = assets
+    score_font = ui.get_font(30, config.FONT_PATH)
+    for kind in ('software', 'gpu_software', 'gpu'):
+        for resolution in config.RESOLUTIONS:
+            renderer = render.create_renderer(resolution, 'benchmark', kind)
+            if kind != 'software' and not renderer.accelerated: break
+            ui.clear_surface_cache()
+            canvas = renderer.canvas
+            bg = pygame.image.load(config.BG_IMG_PATH).convert()
+            fighters = [_make_fighter(1, char_name, char_data, animation_list, flipped, sounds, 200, False),
+                        _make_fighter(2, char_name, char_data, animation_list, flipped, sounds, resolution[0] - 300, True)]
+
+            def frame():
+                ui.draw_bg(canvas, bg)
+                ui.draw_health_bar(canvas, 70, 20, 20); ui.draw_health_bar(canvas, 40, canvas.get_width() - 420, 20)
+                ui.draw_text(canvas, f"{char_name}: 1", score_font, config.RED, 20, 60)
+                for fighter in fighters: fighter.draw(canvas, 0.5)
+                renderer.present()
+
+            results[f"render.{kind}.match_frame@{resolution[0]}x{resolution[1]}"] = measure(frame, repeat=args.repeat)
+    pygame.display.set_mode(config.RESOLUTIONS[0])
+
+def bench_storage(results, args, workdir):
+    from game import commit_match_result, load_missions_master_list
+    master_list = load_missions_master_list()
+    counts = args.users or (QUICK_USER_COUNTS if args.quick else USER_COUNTS)
+    with _in_directory(workdir):
+        for count in counts:
+            users = synthetic_users(count)
+            repeat = 1 if count >= 1000000 else min(args.repeat, 3)
+            for backend_name in ('json', 'sqlite'):
+                db_path = os.path.join(workdir, f"bench_{count}.db")
+                backend = JsonBackend() if backend_name == 'json' else SQLiteBackend(db_path)
+                try:
+                    backend.write_users(backend.prepare_users(users, users.keys(), ()))
+                    results[f"storage.{backend_name}.load_users@{count}"] = measure_once(lambda: None, lambda _: UserRepository(backend).items(), repeat)
+
+                    def loaded_repo(username=next(iter(users))):
+                        repo = UserRepository(backend); repo.items()
+                        with repo.edit(username): pass
+                        return repo
+                    results[f"storage.{backend_name}.save_one_user@{count}"] = measure_once(loaded_repo, lambda repo: repo.flush(), repeat)
+
+                    def all_dirty_repo():
+                        repo = loaded_repo(); repo.mark_dirty(repo.usernames())
+                        return repo
+                    results[f"storage.{backend_name}.save_users@{count}"] = measure_once(all_dirty_repo, lambda repo: repo.flush(), repeat)
+                finally:
+                    backend.close()
+                    if os.path.exists(db_path): os.remove(db_path)
+            del users  # el siguiente tamaño no necesita los anteriores en memoria
+        users = synthetic_users(MATCH_USER_COUNT)
+        username = next(iter(users))
+        for backend_name in ('json', 'sqlite'):
+            backend = JsonBackend() if backend_name == 'json' else SQLiteBackend(os.path.join(workdir, "bench_history.db"))
+            try:
+                backend.write_users(backend.prepare_users(users, users.keys(), ()))
+                backend.save_battle_history([{'timestamp': '2026-01-01 12:00:00', 'p1_char': 'Guerrero', 'p2_char': 'Mago', 'winner': 'Mago'}] * config.BATTLE_HISTORY_LIMIT)
+                with _using_backend(backend):
+                    def play_match():
+                        # Lo que hace el juego al acabar una partida ranked, incluido el
+                        # volcado en el hilo escritor (se espera a que termine).
+                        commit_match_result(username, username, 'Guerrero', 'Mago', True, 'Guerrero', 2, ranked=True, master_list=master_list)
+                        run_in_writer(lambda: None).result()
+                    results[f"storage.{backend_name}.commit_match_result"] = measure(play_match, repeat=args.repeat)
+            finally: backend.close()
+
+def bench_assets(results, args, workdir, assets):
+    from game import Game, _create_spritesheet_from_files
+    _, _, char_data, sheet, _, _, _ = assets
+    pygame.display.set_mode(config.RESOLUTIONS[0])
+    results["assets.load_from_spritesheet"] = measure(lambda: Game._load_from_spritesheet(char_data, sheet), repeat=args.repeat)
+    results["assets.load_sprite_sheet_file"] = measure(lambda: pygame.image.load(char_data["sprite_sheet_path"]).convert_alpha(), repeat=args.repeat)
+    base_path = os.path.join(workdir, "sprites")
+    synthetic_sprite_folders(base_path)
+    results["assets.create_spritesheet_from_files"] = measure(lambda: _create_spritesheet_from_files(base_path, 4, [72, 56]), repeat=min(args.repeat, 3), min_run_time=0.2)
+
+# ==============================================================================
+# RESULTADOS
+# ==============================================================================
+def environment_info():
+    return {"timestamp": datetime.now().isoformat(timespec='seconds'), "python": platform.python_version(),
+            "pygame": pygame.version.ver, "sdl": '.'.join(map(str, pygame.get_sdl_version())), "platform": platform.platform(),
+            "machine": platform.machine(), "cpus": os.cpu_count(), "video_driver": os.environ.get('SDL_VIDEODRIVER')}
+
+def compare(results, baseline, threshold):
+    # Compara el mínimo de cada medición con el de la ejecución base. Devuelve
+    # las que empeoraron más que 'threshold' (0.15 = 15 %).
+    regressions = []
+    print(f"\n{'Medición':<58}{'Base (ms)':>12}{'Ahora (ms)':>12}{'Cambio':>9}")
+    for name, result in results.items():
+        old = baseline.get(name)
+        if not old or not old.get("min_ms"): continue
+        change = result["min_ms"] / old["min_ms"] - 1
+        mark = "  REGRESIÓN" if change > threshold else ""
+        print(f"{name:<58}{old['min_ms']:>12.3f}{result['min_ms']:>12.3f}{change:>+9.1%}{mark}")
+        if change > threshold: regressions.append((name, change))
+    return regressions
+
+def main():
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Benchmarks de dibujo, simulación, persistencia y carga de assets.")
+    parser.add_argument('--groups', nargs='+', choices=BENCH_GROUPS, default=list(BENCH_GROUPS), help="grupos a medir")
+    parser.add_argument('--quick', action='store_true', help="menos usuarios sintéticos (1k y 10k)")
+    parser.add_argument('--users', type=int, nargs='+', help="tamaños de archivo de usuarios a medir")
+    parser.add_argument('--repeat', type=int, default=5, help="tandas por medición")
+    parser.add_argument('-o', '--output', help="archivo JSON de resultados (por defecto en config.BENCH_DIR)")
+    parser.add_argument('--compare', help="resultados anteriores con los que comparar")
+    parser.add_argument('--threshold', type=float, default=config.BENCH_REGRESSION_THRESHOLD, help="empeoramiento tolerado (0.15 = 15%%)")
+    args = parser.parse_args()
+    baseline = None
+    if args.compare:
+        baseline = read_json_file(args.compare, None)
+        if baseline is None: sys.exit(f"Error: no se pudo leer {args.compare}")
+
+    pygame.init()
+    pygame.display.set_mode(config.RESOLUTIONS[0])
+    if pygame.mixer.get_init(): audio_mixer.init()
+    results = {}
+    workdir = tempfile.mkdtemp(prefix='nextgame_bench_')
+    try:
+        assets = _load_game_assets() if {'ui', 'fighter', 'render', 'assets'} & set(args.groups) else None
+        for group in args.groups:
+            start = time.perf_counter()
+            if group == 'ui': bench_ui(results, args, assets)
+            elif group == 'fighter': bench_fighter(results, args, assets)
+            elif group == 'render': bench_render(results, args, assets)
+            elif group == 'storage': bench_storage(results, args, workdir)
+            elif group == 'assets': bench_assets(results, args, workdir, assets)
+            print(f"{group}: {time.perf_counter() - start:.1f} s")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+        pygame.quit()
+
+    for name, result in results.items(): print(f"{name:<58}{result['min_ms']:>12.3f} ms  (mediana {result['median_ms']:.3f})")
+    output = args.output or os.path.join(config.BENCH_DIR, f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    atomic_write_json(output, {"environment": environment_info(), "results": results})
+    print(f"\nResultados guardados en {output}")
+    if baseline is not None:
+        regressions = compare(results, baseline.get("results", {}), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regresiones por encima del {args.threshold:.0%}")
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+# collision.py
+# Hitboxes, hurtboxes y proyectiles. Sin pygame: lo usan el juego, las
+# repeticiones y el simulador. Las cajas son tuplas (x, y, ancho, alto).
+#
+# Datos opcionales en characters.json, relativos al rect del luchador (80x180)
+# mirando a la derecha; al girar se reflejan:
+#   "hurtboxes": {"default": [[x, y, w, h], ...], "<fila>": {"<frame>": [[x, y, w, h], ...]}}
+#   "hitboxes": {"<fila>": {"<frame>": [[x, y, w, h], ...]}}
+# y por movimiento especial:
+#   "projectile": {"speed": 12, "size": [40, 40], "offset": [80, 60], "lifetime": 120}
+# Un personaje sin hurtboxes usa el rect entero; un ataque sin hitboxes golpea
+# al instante con la caja de siempre (dos anchos de rect hacia delante).
+import config
+
+def overlaps(a, b):
+    return (a[2] > 0 and a[3] > 0 and b[2] > 0 and b[3] > 0
+            and a[0] < b[0] + b[2] and b[0] < a[0] + a[2]
+            and a[1] < b[1] + b[3] and b[1] < a[1] + a[3])
+
+def uses_projectiles(char_data):
+    return any("projectile" in move for move in char_data.get("special_moves", {}).values())
+
+def place_box(rect, box, flip):
+    # Caja relativa al rect -> caja en coordenadas de la arena.
+    x, y, width, height = box
+    if flip: x = rect.width - x - width
+    return (rect.x + x, rect.y + y, width, height)
+
+
+class CharacterBoxes:
+    def __init__(self, hurtboxes=None, hitboxes=None):
+        self.data = {"hurtboxes": hurtboxes or {}, "hitboxes": hitboxes or {}}
+        self.default_hurtboxes = [tuple(box) for box in (hurtboxes or {}).get("default", [])]
+        self._hurtboxes = self._parse_frames(hurtboxes or {})
+        self._hitboxes = self._parse_frames(hitboxes or {})
+        self.hitbox_rows = {row for row, _ in self._hitboxes}
+
+    @staticmethod
+    def _parse_frames(data):
+        frames = {}
+        for row, row_frames in data.items():
+            if row == "default": continue
+            for frame, boxes in row_frames.items(): frames[(int(row), int(frame))] = [tuple(box) for box in boxes]
+        return frames
+
+    @classmethod
+    def from_character(cls, char_data):
+        # None si el personaje no define cajas (comportamiento clásico).
+        if not char_data.get("hurtboxes") and not char_data.get("hitboxes"): return None
+        return cls(char_data.get("hurtboxes"), char_data.get("hitboxes"))
+
+    def hurtboxes_at(self, action, frame_index):
+        return self._hurtboxes.get((action, frame_index), self.default_hurtboxes)
+
+    def hitboxes_at(self, action, frame_index):
+        return self._hitboxes.get((action, frame_index), ())
+
+
+class SpatialGrid:
+    # Rejilla uniforme: cada entidad se apunta en las celdas que tocan sus
+    # cajas y una consulta solo mira las entidades de sus celdas, así el coste
+    # no crece con el cuadrado del número de entidades.
+    def __init__(self, cell_size=config.COLLISION_CELL_SIZE):
+        self.cell_size = cell_size
+        self._cells = {}
+        self._entries = {}  # entidad -> (rango de celdas, cajas)
+
+    def _cell_range(self, boxes):
+        size = self.cell_size
+        return (min(box[0] for box in boxes) // size, min(box[1] for box in boxes) // size,
+                (max(box[0] + box[2] for box in boxes) - 1) // size, (max(box[1] + box[3] for box in boxes) - 1) // size)
+
+    def _cells_in(self, cell_range):
+        x0, y0, x1, y1 = cell_range
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1): yield (cx, cy)
+
+    def update(self, entity, boxes):
+        old = self._entries.get(entity)
+        if not boxes: self.remove(entity); return
+        cell_range = self._cell_range(boxes)
+        if old is not None and old[0] == cell_range:
+            self._entries[entity] = (cell_range, boxes); return
+        if old is not None: self.remove(entity)
+        for cell in self._cells_in(cell_range): self._cells.setdefault(cell, set()).add(entity)
+        self._entries[entity] = (cell_range, boxes)
+
+    def remove(self, entity):
+        old = self._entries.pop(entity, None)
+        if old is None: return
+        for cell in self._cells_in(old[0]):
+            members = self._cells.get(cell)
+            if members is not None:
+                members.discard(entity)
+                if not members: del self._cells[cell]
+
+    def query(self, box):
+        # Entidades con alguna caja que se solapa con 'box', en orden de
+        # entity_id para que el resultado no dependa del orden de los sets.
+        candidates = set()
+        for cell in self._cells_in(self._cell_range([box])):
+            members = self._cells.get(cell)
+            if members: candidates |= members
+        hits = [entity for entity in candidates if any(overlaps(box, other) for other in self._entries[entity][1])]
+        hits.sort(key=lambda entity: entity.entity_id)
+        return hits
+
+
+class Projectile:
+    def __init__(self, entity_id, owner, move_key, move_data):
+        spec = move_data["projectile"]
+        width, height = spec.get("size", config.PROJECTILE_SIZE)
+        offset_x, offset_y = spec.get("offset", (owner.rect.width, owner.rect.height // 3))
+        self.entity_id = entity_id
+        self.owner, self.move_key = owner, move_key
+        self.damage = move_data.get("damage", 10)
+        self.vx = -spec.get("speed", config.PROJECTILE_SPEED) if owner.flip else spec.get("speed", config.PROJECTILE_SPEED)
+        self.box = place_box(owner.rect, (offset_x, offset_y, width, height), owner.flip)
+        self.prev_x = self.box[0]
+        self.ticks_left = spec.get("lifetime", config.PROJECTILE_LIFETIME)
+        self.alive = True
+
+    def step(self, arena):
+        x, y, width, height = self.box
+        self.prev_x = x
+        self.box = (x + self.vx, y, width, height)
+        self.ticks_left -= 1
+        if self.ticks_left <= 0 or self.box[0] + width < 0 or self.box[0] > arena[0]: self.alive = False
+
+
+class CollisionWorld:
+    # Luchadores y proyectiles de un combate. Los luchadores se registran con
+    # add() y avisan con moved() cuando cambian su posición o sus hurtboxes;
+    # los ataques consultan la rejilla en lugar de probar contra todos.
+    def __init__(self, arena, cell_size=config.COLLISION_CELL_SIZE):
+        self.arena = arena
+        self.grid = SpatialGrid(cell_size)
+        self.fighters = []
+        self.projectiles = []
+        self._next_id = 1
+
+    def _new_id(self):
+        entity_id, self._next_id = self._next_id, self._next_id + 1
+        return entity_id
+
+    def add(self, fighter):
+        fighter.world, fighter.entity_id = self, self._new_id()
+        self.fighters.append(fighter)
+        self.moved(fighter)
+
+    def moved(self, fighter):
+        if fighter.alive: self.grid.update(fighter, fighter.hurtboxes())
+        else: self.grid.remove(fighter)
+
+    def targets_in(self, box, attacker):
+        return [fighter for fighter in self.grid.query(box) if fighter.team != attacker.team and fighter.alive]
+
+    def spawn_projectile(self, owner, move_key, move_data):
+        projectile = Projectile(self._new_id(), owner, move_key, move_data)
+        self.projectiles.append(projectile)
+        return projectile
+
+    def step(self):
+        # Avanza los proyectiles un tick; cada uno golpea como mucho a un
+        # luchador (el de menor entity_id si toca a varios) y desaparece.
+        if not self.projectiles: return
+        for projectile in self.projectiles:
+            projectile.step(self.arena)
+            if not projectile.alive: continue
+            targets = self.targets_in(projectile.box, projectile.owner)
+            if targets:
+                projectile.owner.deal_damage(targets[0], projectile.move_key, projectile.damage)
+                projectile.alive = False
+        self.projectiles = [projectile for projectile in self.projectiles if projectile.alive]
@@ -1,5 +1,4 @@
 # config.py
-import pygame
 
 # --- CONSTANTES PARA RANKEDS ---
 LP_WIN = 15
@@ -17,12 +16,23 @@ RANKS = [
 USERS_FILE = 'users.json'
 CHARACTERS_FILE = 'characters.json'
 MISSIONS_FILE = 'missions.json'
+BATTLE_HISTORY_FILE = 'battle_history.json'
 VALID_DOMAINS = ['@gmail.com', '@yahoo.cl', '@hotmail.com']
 FONT_PATH = 'assets/fonts/turok.ttf'
 MUSIC_PATH = 'assets/audio/music.mp3'
 BG_IMG_PATH = 'assets/images/background/background.jpg'
 VICTORY_IMG_PATH = 'assets/images/icons/victory.png'
 DEFEAT_IMG_PATH = 'assets/images/icons/defeat.png'
+ASSET_CACHE_DIR = 'cache/atlas'
+REPLAY_DIR = 'replays'
+LOGIN_VIDEO_PATH = 'assets/videos/login_bg.mp4'
+LOGIN_VIDEO_SIZE = (1280, 720)  # tamaño al que se estira el vídeo de fondo del login
+VIDEO_CACHE_DIR = 'cache/video'  # vídeo del login ya escalado (MJPG)
+
+# --- ALMACENAMIENTO ---
+STORAGE_BACKEND = 'json'  # 'json' (archivos actuales) o 'sqlite'
+SQLITE_DB_FILE = 'darkhi.db'
+BATTLE_HISTORY_LIMIT = 50
 
 # --- MAPAS (ACTUALIZADO) ---
 MAPS = {
@@ -58,8 +68,38 @@ MAPS = {
 
 # --- CONSTANTES DEL JUEGO ---
 FPS = 60
+SIM_TICK_RATE = 60  # ticks de simulación por segundo, independientes de los FPS
+SIM_TICK_MS = 1000 / SIM_TICK_RATE
+MAX_SIM_STEPS = 5  # ticks máximos por frame; el resto se descarta si la máquina no da abasto
+SIM_MAX_MATCH_SECONDS = 120  # límite de un combate en el simulador; al llegar es empate
+SIM_CHUNK_SIZE = 250  # combates por tarea al repartir la simulación entre procesos
+SIM_BATCH_SIZE = 50000  # combates simultáneos en el motor vectorizado
+REPLAY_MAX_SPEED = 64  # avance rápido máximo al ver una repetición
+PROFILER_ENABLED = False  # también con 'python main.py --profile' o F3 durante el juego
+PROFILER_WINDOW = 600  # frames usados para percentiles y medias del overlay
+PROFILER_TRACE_FRAMES = 1800  # frames guardados para exportar la traza (F4)
+PROFILER_SUMMARY_FRAMES = 30  # cada cuántos frames se recalcula el overlay
+PROFILE_DIR = 'profiles'
+BENCH_DIR = 'benchmarks'  # resultados de benchmark.py
+BENCH_REGRESSION_THRESHOLD = 0.15  # empeoramiento que benchmark.py --compare marca como regresión
 RESOLUTIONS = [(800, 600), (1024, 768), (1280, 720), (1920, 1080)]
 ROUND_COOLDOWN = 2000
+STATE_FLUSH_INTERVAL = 5000  # ms entre volcados a disco del estado en memoria
+SURFACE_CACHE_LIMIT = 64  # máximo de superficies escaladas guardadas en ui
+TEXT_CACHE_MAX_BYTES = 8 * 1024 * 1024  # memoria máxima de textos renderizados en caché
+PRELOAD_WORKERS = 2  # hilos que cargan assets en segundo plano
+AUDIO_CHANNELS = 16  # canales del mezclador (los primeros, reservados: ver audio.py)
+AUDIO_VOICES_PER_FIGHTER = 2  # sonidos a la vez por luchador antes de cortar el menos importante
+MUSIC_DECODE_MAX_FILE = 4 * 1024 * 1024  # música de hasta este tamaño se decodifica en memoria; la mayor se lee de disco
+RENDERER = 'software'  # 'software', 'gpu' o 'gpu_software' (ver render.py); también 'python main.py --gpu'
+TEXTURE_CACHE_LIMIT = 512  # texturas guardadas por el renderizador por GPU
+ANIMATED_BG_FRAMES = 8  # frames escalados en el búfer de un fondo animado
+DIRTY_BAND_HEIGHT = 32  # alto en píxeles de las franjas que se comparan en los menús
+IDLE_WAIT_MS = 250  # espera máxima por eventos mientras un menú no cambia
+COLLISION_CELL_SIZE = 128  # lado en píxeles de las celdas de la rejilla de colisiones
+PROJECTILE_SPEED = 12  # valores por defecto de "projectile" en un movimiento (por tick)
+PROJECTILE_SIZE = (40, 40)
+PROJECTILE_LIFETIME = 120
 DAILY_MISSIONS_COUNT = 3
 
 # --- COLORES ---
@@ -78,4 +118,6 @@ CRUD_MENU_ITEMS = ['Añadir Personaje', 'Ver Datos', 'Editar Estadísticas', 'Ge
 USER_CRUD_ITEMS = ['Editar Perfil', 'Resetear Perfil', 'Editar Ranked', 'Resetear Ranked', 'Volver']
 MISSION_CRUD_ITEMS = ['Añadir Misión', 'Editar Misión', 'Eliminar Misión', 'Volver']
 MOVE_CRUD_OPTIONS = ['Añadir', 'Editar Tecla', 'Eliminar', 'Volver']
-FORBIDDEN_KEYS = [pygame.K_w, pygame.K_a, pygame.K_s, pygame.K_d]
\ No newline at end of file
+# Códigos de pygame.K_w, K_a, K_s y K_d; config no importa pygame para poder
+# usarse desde el simulador sin pantalla.
+FORBIDDEN_KEYS = [ord('w'), ord('a'), ord('s'), ord('d')]
\ No newline at end of file
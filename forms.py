@@ -0,0 +1,280 @@
+# forms.py
+# Formularios de edición (customtkinter). Game los importa la primera vez que
+# abre uno, así ni customtkinter ni estas clases se cargan al arrancar.
+import json
+import customtkinter as ctk
+from tkinter import messagebox
+from datetime import datetime
+import config
+from collision import CharacterBoxes
+from auth import user_repo, leaderboard
+from game import (load_characters, save_characters, change_battle_history,
+                  load_missions_master_list, save_missions_master_list, _create_spritesheet_from_files)
+
+def hidden_root():
+    # Ventana raíz oculta que hace de padre de los formularios y diálogos.
+    root = ctk.CTk(); root.withdraw()
+    return root
+
+class CharacterForm(ctk.CTkToplevel):
+    def __init__(self, master, callback, character_data=None, character_name=None, read_only=False):
+        super().__init__(master)
+        self.callback = callback; self.character_data = character_data; self.character_name = character_name
+        self.title("Añadir Personaje" if not character_name else f"Datos de {character_name}")
+        self.geometry("550x700"); self.grid_columnconfigure(1, weight=1); self.fields = {};
+        self.protocol("WM_DELETE_WINDOW", self.destroy)
+        self.create_widgets()
+        if self.character_data: self.fill_form()
+        if read_only:
+            for widget in self.fields.values():
+                if isinstance(widget, (ctk.CTkEntry, ctk.CTkOptionMenu)): widget.configure(state="disabled")
+            self.save_button.configure(state="disabled", text="Cerrar", command=self.destroy)
+        if self.character_name: self.fields["asset_type"].configure(state="disabled")
+        self.grab_set()
+
+    def create_widgets(self):
+        self.fields = {}; row_counter = 0
+        def create_row(key, text):
+            nonlocal row_counter
+            label = ctk.CTkLabel(self, text=text); label.grid(row=row_counter, column=0, padx=10, pady=5, sticky="w")
+            entry = ctk.CTkEntry(self); entry.grid(row=row_counter, column=1, padx=10, pady=5, sticky="ew")
+            self.fields[key] = entry; row_counter += 1
+            return label, entry
+        create_row("nombre", "Nombre")
+        label_asset = ctk.CTkLabel(self, text="Tipo de Asset"); label_asset.grid(row=row_counter, column=0, padx=10, pady=5, sticky="w")
+        self.asset_type_var = ctk.StringVar(value="Spritesheet")
+        asset_menu = ctk.CTkOptionMenu(self, values=["Spritesheet", "Archivos Individuales"], variable=self.asset_type_var, command=self.update_form_fields)
+        asset_menu.grid(row=row_counter, column=1, padx=10, pady=5, sticky="ew"); self.fields['asset_type'] = asset_menu; row_counter += 1
+        self.label_ss, self.entry_ss = create_row("sprite_sheet_path", "Ruta Spritesheet")
+        self.label_as, self.entry_as = create_row("animation_steps", "Pasos Animación")
+        self.label_bp, self.entry_bp = create_row("base_path", "Ruta Carpeta Base")
+        self.label_w, self.entry_w = create_row("frame_w", "Ancho Frame")
+        self.label_h, self.entry_h = create_row("frame_h", "Alto Frame")
+        create_row("sound_path", "Ruta Sonido")
+        create_row("escala", "Escala Imagen")
+        create_row("offsetx", "Offset X")
+        create_row("offsety", "Offset Y")
+        # Opcionales, en el formato de collision.py; vacíos = rect entero y golpe clásico.
+        create_row("hurtboxes", "Hurtboxes (JSON)")
+        create_row("hitboxes", "Hitboxes (JSON)")
+        self.save_button = ctk.CTkButton(self, text="Guardar", command=self.save); self.save_button.grid(row=row_counter, columnspan=2, pady=20)
+        self.update_form_fields()
+
+    def update_form_fields(self, selected_type=None):
+        if selected_type is None: selected_type = self.asset_type_var.get()
+        is_spritesheet = selected_type == "Spritesheet"
+        def set_visibility(label, entry, is_visible):
+            if is_visible: label.grid(); entry.grid()
+            else: label.grid_remove(); entry.grid_remove()
+        set_visibility(self.label_ss, self.entry_ss, is_spritesheet); set_visibility(self.label_as, self.entry_as, is_spritesheet)
+        set_visibility(self.label_w, self.entry_w, is_spritesheet); set_visibility(self.label_h, self.entry_h, is_spritesheet)
+        set_visibility(self.label_bp, self.entry_bp, not is_spritesheet)
+
+    def fill_form(self):
+        self.fields["nombre"].insert(0, self.character_name)
+        if "sprite_sheet_path" in self.character_data:
+            self.asset_type_var.set("Spritesheet")
+            self.fields["sprite_sheet_path"].insert(0, self.character_data["sprite_sheet_path"])
+            self.fields["animation_steps"].insert(0, ", ".join(map(str, self.character_data.get("animation_steps", []))))
+            data = self.character_data.get("data", [0, 0, 4, [0, 0]])
+            self.fields["frame_w"].insert(0, str(data[0])); self.fields["frame_h"].insert(0, str(data[1]))
+        elif "base_path" in self.character_data:
+            self.asset_type_var.set("Archivos Individuales"); self.fields["base_path"].insert(0, self.character_data["base_path"])
+        self.update_form_fields()
+        self.fields["sound_path"].insert(0, self.character_data.get("sound_path", ""))
+        data = self.character_data.get("data", [0, 0, 4, [0, 0]])
+        self.fields["escala"].insert(0, str(data[2])); self.fields["offsetx"].insert(0, str(data[3][0])); self.fields["offsety"].insert(0, str(data[3][1]))
+        for key in ("hurtboxes", "hitboxes"):
+            if self.character_data.get(key): self.fields[key].insert(0, json.dumps(self.character_data[key]))
+    
+    def save(self):
+        try:
+            name = self.fields["nombre"].get()
+            if not name: messagebox.showerror("Error", "El nombre no puede estar vacío.", parent=self); return
+            characters = load_characters()
+            if not self.character_name and name in characters: messagebox.showerror("Error", "Ya existe un personaje con este nombre.", parent=self); return
+            new_data = {"sound_path": self.fields["sound_path"].get(), "stats": {"health": 100, "speed": 10, "damage": 10}, "special_moves": {}}
+            if self.asset_type_var.get() == "Spritesheet":
+                new_data["sprite_sheet_path"] = self.fields["sprite_sheet_path"].get()
+                new_data["animation_steps"] = [int(s.strip()) for s in self.fields["animation_steps"].get().split(',')]
+                new_data["data"] = [int(self.fields["frame_w"].get()), int(self.fields["frame_h"].get()), int(self.fields["escala"].get()), [int(self.fields["offsetx"].get()), int(self.fields["offsety"].get())]]
+            else:
+                conversion_result = _create_spritesheet_from_files(self.fields["base_path"].get(), int(self.fields["escala"].get()), [int(self.fields["offsetx"].get()), int(self.fields["offsety"].get())])
+                if conversion_result is None: return
+                new_data.update(conversion_result)
+            for key in ("hurtboxes", "hitboxes"):
+                text = self.fields[key].get().strip()
+                if text: new_data[key] = json.loads(text)
+            CharacterBoxes.from_character(new_data)  # falla aquí si las cajas están mal formadas
+            characters[name] = new_data
+            save_characters(characters)
+            messagebox.showinfo("Éxito", f"Personaje '{name}' procesado y guardado.", parent=self)
+            self.callback(); self.destroy()
+        except json.JSONDecodeError as e: messagebox.showerror("Error de Formato", f"JSON de cajas no válido: {e}", parent=self)
+        except ValueError: messagebox.showerror("Error de Valor", "Introduce números válidos.", parent=self)
+        except Exception as e: messagebox.showerror("Error Inesperado", f"Ocurrió un error: {e}", parent=self)
+
+class StatEditForm(ctk.CTkToplevel):
+    def __init__(self, master, callback, character_name):
+        super().__init__(master)
+        self.callback = callback; self.character_name = character_name
+        self.title(f"Editar Stats de {character_name}"); self.geometry("400x300")
+        self.grid_columnconfigure(1, weight=1); self.fields = {}; self.protocol("WM_DELETE_WINDOW", self.destroy)
+        self.create_widgets(); self.fill_form(); self.grab_set()
+    def create_widgets(self):
+        self.character_data = load_characters()[self.character_name]
+        field_map = {"health": "Vida", "damage": "Daño", "speed": "Velocidad"}
+        for i, (key, label_text) in enumerate(field_map.items()):
+            label = ctk.CTkLabel(self, text=label_text); label.grid(row=i, column=0, padx=10, pady=10, sticky="w")
+            entry = ctk.CTkEntry(self); entry.grid(row=i, column=1, padx=10, pady=10, sticky="ew"); self.fields[key] = entry
+        save_button = ctk.CTkButton(self, text="Guardar Stats", command=self.save); save_button.grid(row=len(field_map), columnspan=2, pady=20)
+    def fill_form(self):
+        stats = self.character_data.get("stats", {})
+        self.fields["health"].insert(0, str(stats.get("health", 100))); self.fields["damage"].insert(0, str(stats.get("damage", 10))); self.fields["speed"].insert(0, str(stats.get("speed", 10)))
+    def save(self):
+        try:
+            characters = load_characters()
+            characters[self.character_name]["stats"] = {"health": int(self.fields["health"].get()), "damage": int(self.fields["damage"].get()), "speed": int(self.fields["speed"].get())}
+            save_characters(characters); messagebox.showinfo("Éxito", f"Stats de '{self.character_name}' guardadas.", parent=self)
+            self.callback(); self.destroy()
+        except ValueError: messagebox.showerror("Error de Valor", "Introduce números válidos.", parent=self)
+
+class BattleHistoryForm(ctk.CTkToplevel):
+    def __init__(self, master, callback, battle_data=None):
+        super().__init__(master)
+        self.callback = callback; self.battle_data = battle_data
+        self.title("Editar Registro" if battle_data else "Añadir Registro")
+        self.geometry("400x300"); self.grid_columnconfigure(1, weight=1); self.fields = {}
+        self.protocol("WM_DELETE_WINDOW", self.destroy); self.create_widgets()
+        if battle_data: self.fill_form()
+        self.grab_set()
+    def create_widgets(self):
+        row_counter = 0; field_map = {"p1_char": "Jugador 1", "p2_char": "Jugador 2", "winner": "Ganador"}
+        for key, text in field_map.items():
+            label = ctk.CTkLabel(self, text=text); label.grid(row=row_counter, column=0, padx=10, pady=10, sticky="w")
+            entry = ctk.CTkEntry(self); entry.grid(row=row_counter, column=1, padx=10, pady=10, sticky="ew"); self.fields[key] = entry; row_counter += 1
+        self.save_button = ctk.CTkButton(self, text="Guardar", command=self.save); self.save_button.grid(row=row_counter, columnspan=2, pady=20)
+    def fill_form(self):
+        self.fields["p1_char"].insert(0, self.battle_data.get("p1_char", "")); self.fields["p2_char"].insert(0, self.battle_data.get("p2_char", "")); self.fields["winner"].insert(0, self.battle_data.get("winner", ""))
+    def save(self):
+        p1 = self.fields["p1_char"].get(); p2 = self.fields["p2_char"].get(); winner = self.fields["winner"].get()
+        if not all([p1, p2, winner]): messagebox.showerror("Error", "Todos los campos son obligatorios.", parent=self); return
+        new_record = {"timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "p1_char": p1, "p2_char": p2, "winner": winner}
+        old_record = self.battle_data
+        if old_record is not None and old_record.get("replay"): new_record["replay"] = old_record["replay"]
+        def change(history):
+            # Se busca por contenido: si el registro ya no está (borrado mientras
+            # tanto) el editado se añade como nuevo.
+            if old_record in history: history[history.index(old_record)] = new_record
+            else: history.insert(0, new_record)
+        change_battle_history(change)
+        messagebox.showinfo("Éxito", "El historial ha sido actualizado.", parent=self); self.callback(); self.destroy()
+
+class ProfileStatEditForm(ctk.CTkToplevel):
+    def __init__(self, master, callback, username):
+        super().__init__(master)
+        self.callback = callback; self.username = username
+        self.user_data = user_repo.get(username) or {}
+        self.title(f"Editar Perfil de {username}")
+        self.geometry("400x400"); self.grid_columnconfigure(1, weight=1)
+        self.protocol("WM_DELETE_WINDOW", self.destroy); self.fields = {}
+        self.create_widgets(); self.fill_form(); self.grab_set()
+
+    def create_widgets(self):
+        field_map = {"play_time_seconds": "Tiempo Jugado (s)", "matches_played": "Partidas Jugadas", "matches_won": "Victorias", "matches_lost": "Derrotas"}
+        for i, (key, text) in enumerate(field_map.items()):
+            label = ctk.CTkLabel(self, text=text); label.grid(row=i, column=0, padx=10, pady=10, sticky="w")
+            entry = ctk.CTkEntry(self); entry.grid(row=i, column=1, padx=10, pady=10, sticky="ew"); self.fields[key] = entry
+        save_button = ctk.CTkButton(self, text="Guardar Cambios", command=self.save); save_button.grid(row=len(field_map), columnspan=2, pady=20)
+
+    def fill_form(self):
+        stats = self.user_data.get("profile_stats", {})
+        for key, widget in self.fields.items():
+            widget.insert(0, str(stats.get(key, 0)))
+
+    def save(self):
+        try:
+            new_stats = {key: int(widget.get()) for key, widget in self.fields.items()}
+            with user_repo.edit(self.username) as user:
+                if user is not None:
+                    if 'profile_stats' not in user: user['profile_stats'] = {}
+                    user['profile_stats'].update(new_stats)
+            if user is not None:
+                messagebox.showinfo("Éxito", "Estadísticas de perfil actualizadas.", parent=self)
+                self.callback(); self.destroy()
+        except ValueError: messagebox.showerror("Error", "Todos los campos deben ser números enteros.", parent=self)
+
+class RankedStatEditForm(ctk.CTkToplevel):
+    def __init__(self, master, callback, username):
+        super().__init__(master)
+        self.callback = callback; self.username = username
+        self.user_data = user_repo.get(username) or {}
+        self.title(f"Editar Ranked de {username}"); self.geometry("400x250"); self.grid_columnconfigure(1, weight=1)
+        self.protocol("WM_DELETE_WINDOW", self.destroy); self.fields = {}
+        self.create_widgets(); self.fill_form(); self.grab_set()
+
+    def create_widgets(self):
+        lp_label = ctk.CTkLabel(self, text="Puntos de Liga (LP)"); lp_label.grid(row=0, column=0, padx=10, pady=10, sticky="w")
+        self.lp_entry = ctk.CTkEntry(self); self.lp_entry.grid(row=0, column=1, padx=10, pady=10, sticky="ew")
+        rank_label = ctk.CTkLabel(self, text="Rango"); rank_label.grid(row=1, column=0, padx=10, pady=10, sticky="w")
+        rank_names = [r['name'] for r in config.RANKS]
+        self.rank_var = ctk.StringVar()
+        self.rank_menu = ctk.CTkOptionMenu(self, variable=self.rank_var, values=rank_names)
+        self.rank_menu.grid(row=1, column=1, padx=10, pady=10, sticky="ew")
+        save_button = ctk.CTkButton(self, text="Guardar Cambios", command=self.save); save_button.grid(row=2, columnspan=2, pady=20)
+
+    def fill_form(self):
+        stats = self.user_data.get("ranked_stats", {})
+        self.lp_entry.insert(0, str(stats.get("league_points", 0)))
+        self.rank_var.set(stats.get("rank", "Bronce"))
+
+    def save(self):
+        try:
+            league_points = int(self.lp_entry.get())
+            with user_repo.edit(self.username) as user:
+                if user is not None:
+                    if 'ranked_stats' not in user: user['ranked_stats'] = {}
+                    user['ranked_stats']['league_points'] = league_points
+                    user['ranked_stats']['rank'] = self.rank_var.get()
+                    leaderboard.update(self.username, user['ranked_stats'])
+            if user is not None:
+                messagebox.showinfo("Éxito", "Estadísticas de ranked actualizadas.", parent=self)
+                self.callback(); self.destroy()
+        except ValueError: messagebox.showerror("Error", "Los LP deben ser un número entero.", parent=self)
+
+class MissionEditForm(ctk.CTkToplevel):
+    def __init__(self, master, callback, mission_data=None, mission_id=None):
+        super().__init__(master)
+        self.callback = callback; self.mission_data = mission_data if mission_data else {}; self.mission_id = mission_id
+        is_editing = mission_id is not None
+        self.title("Editar Misión" if is_editing else "Añadir Nueva Misión")
+        self.geometry("500x400"); self.grid_columnconfigure(1, weight=1)
+        self.protocol("WM_DELETE_WINDOW", self.destroy); self.fields = {}
+        self.create_widgets(); self.fill_form(); self.grab_set()
+
+    def create_widgets(self):
+        row = 0; field_map = {"id": "ID de la Misión (ej: m8)", "description": "Descripción", "type": "Tipo de Misión", "target": "Objetivo (número)", "reward": "Recompensa (número)", "character": "Personaje (opcional)"}
+        for key, text in field_map.items():
+            label = ctk.CTkLabel(self, text=text); label.grid(row=row, column=0, padx=10, pady=10, sticky="w")
+            entry = ctk.CTkEntry(self); entry.grid(row=row, column=1, padx=10, pady=10, sticky="ew"); self.fields[key] = entry; row += 1
+        if self.mission_id: self.fields['id'].configure(state='disabled')
+        save_button = ctk.CTkButton(self, text="Guardar Misión", command=self.save); save_button.grid(row=row, columnspan=2, pady=20)
+
+    def fill_form(self):
+        if self.mission_id: self.fields['id'].insert(0, self.mission_id)
+        for key, widget in self.fields.items():
+            if key != 'id' and key in self.mission_data: widget.insert(0, str(self.mission_data[key]))
+
+    def save(self):
+        try:
+            missions = load_missions_master_list()
+            mission_id = self.fields['id'].get()
+            if not mission_id: messagebox.showerror("Error", "El ID de la misión no puede estar vacío.", parent=self); return
+            if not self.mission_id and mission_id in missions: messagebox.showerror("Error", "Ya existe una misión con ese ID.", parent=self); return
+            new_data = {"description": self.fields['description'].get(), "type": self.fields['type'].get(), "target": int(self.fields['target'].get()), "reward": int(self.fields['reward'].get())}
+            if self.fields['character'].get(): new_data['character'] = self.fields['character'].get()
+            missions[mission_id] = new_data
+            save_missions_master_list(missions)
+            messagebox.showinfo("Éxito", "Misión guardada correctamente.", parent=self)
+            self.callback(); self.destroy()
+        except ValueError: messagebox.showerror("Error", "Objetivo y Recompensa deben ser números.", parent=self)
@@ -0,0 +1,55 @@
+# leaderboard.py
+import bisect
+
+class LeaderboardIndex:
+    # Índice de jugadores ranked ordenado por LP (mayor primero). Se construye
+    # una vez desde el repositorio y luego se mantiene con update()/remove().
+    # Consultar la posición de un jugador es O(log n) y el top k es O(k).
+    def __init__(self, user_source):
+        self._source = user_source
+        self._entries = None  # lista ordenada de (-lp, nombre)
+        self._by_name = {}    # nombre -> (lp, rango)
+
+    def _ensure_built(self):
+        if self._entries is not None: return
+        self._by_name = {}
+        for name, data in self._source.items():
+            if "ranked_stats" in data:
+                stats = data["ranked_stats"]
+                self._by_name[name] = (stats.get("league_points", 0), stats.get("rank", "Bronce"))
+        self._entries = sorted((-lp, name) for name, (lp, _) in self._by_name.items())
+
+    def update(self, username, ranked_stats):
+        self._ensure_built()
+        lp, rank = ranked_stats.get("league_points", 0), ranked_stats.get("rank", "Bronce")
+        previous = self._by_name.get(username)
+        if previous is not None:
+            if previous[0] != lp:
+                del self._entries[bisect.bisect_left(self._entries, (-previous[0], username))]
+                bisect.insort(self._entries, (-lp, username))
+        else:
+            bisect.insort(self._entries, (-lp, username))
+        self._by_name[username] = (lp, rank)
+
+    def remove(self, username):
+        self._ensure_built()
+        previous = self._by_name.pop(username, None)
+        if previous is not None:
+            del self._entries[bisect.bisect_left(self._entries, (-previous[0], username))]
+
+    def position_of(self, username):
+        self._ensure_built()
+        entry = self._by_name.get(username)
+        if entry is None: return None
+        return bisect.bisect_left(self._entries, (-entry[0], username)) + 1
+
+    def top(self, k):
+        self._ensure_built()
+        players = []
+        for neg_lp, name in self._entries[:k]:
+            players.append({"name": name, "lp": -neg_lp, "rank": self._by_name[name][1]})
+        return players
+
+    def __len__(self):
+        self._ensure_built()
+        return len(self._entries)
@@ -0,0 +1,131 @@
+# login_video.py
+# Vídeo de fondo de la pantalla de inicio de sesión. Un hilo decodifica con
+# OpenCV en búferes fijos (dos: uno se muestra mientras se llena el otro) y el
+# hilo de Tk recoge el último frame con root.after, al ritmo de los FPS reales
+# del vídeo, y lo copia en una única PhotoImage; el hilo nunca toca Tk.
+# La primera vez el vídeo se escala a la zona visible mientras se reproduce y
+# se guarda en config.VIDEO_CACHE_DIR como MJPG (todos los frames son clave):
+# desde entonces se decodifica ya a su tamaño y volver al principio del bucle
+# no obliga a decodificar desde un fotograma clave lejano.
+import os
+import queue
+import threading
+import time
+import cv2
+import numpy as np
+from PIL import Image, ImageTk
+import config
+
+_DEFAULT_FPS = 30
+
+def _cache_prefix(video_path):
+    return os.path.splitext(os.path.basename(video_path))[0] + '_'
+
+def _cache_path(video_path, size):
+    stat = os.stat(video_path)
+    return os.path.join(config.VIDEO_CACHE_DIR, f"{_cache_prefix(video_path)}{size[0]}x{size[1]}_{stat.st_size}_{stat.st_mtime_ns}.avi")
+
+def _remove_stale_caches(video_path, cache_path):
+    # Versiones del mismo vídeo a otro tamaño o de un archivo anterior.
+    prefix = _cache_prefix(video_path)
+    for name in os.listdir(config.VIDEO_CACHE_DIR):
+        path = os.path.join(config.VIDEO_CACHE_DIR, name)
+        if name.startswith(prefix) and name.endswith('.avi') and path != cache_path:
+            try: os.remove(path)
+            except OSError: pass
+
+
+class LoginVideo:
+    def __init__(self, root, canvas, video_path, size, scale_size=config.LOGIN_VIDEO_SIZE):
+        # 'scale_size' es el tamaño al que se estira el vídeo; 'size' la parte
+        # visible del lienzo (esquina superior izquierda), la única que se decodifica.
+        self.root, self.video_path = root, video_path
+        self.size = (min(int(size[0]), scale_size[0]), min(int(size[1]), scale_size[1]))
+        self.scale_size = scale_size
+        self.cache_path = _cache_path(video_path, self.size)
+        self.source = self.cache_path if os.path.exists(self.cache_path) else video_path
+        self._capture = cv2.VideoCapture(self.source)
+        if not self._capture.isOpened(): raise OSError(f"no se pudo abrir {self.source}")
+        self.frame_ms = 1000 / (self._capture.get(cv2.CAP_PROP_FPS) or _DEFAULT_FPS)
+        width, height = self.size
+        self._free, self._ready = queue.Queue(), queue.Queue(maxsize=1)
+        for _ in range(2): self._free.put(np.empty((height, width, 3), np.uint8))
+        self._scaled = np.empty((height, width, 3), np.uint8)
+        self._photo = ImageTk.PhotoImage('RGB', self.size)
+        canvas.create_image(0, 0, anchor='nw', image=self._photo)
+        self.is_running = False
+        self._after_id, self._next_due = None, 0
+
+    def start(self):
+        self.is_running = True
+        threading.Thread(target=self._decode, name='login_video', daemon=True).start()
+        self._next_due = time.perf_counter() * 1000
+        self._after_id = self.root.after(0, self._show_next)
+
+    def stop(self):
+        self.is_running = False
+        if self._after_id is not None:
+            try: self.root.after_cancel(self._after_id)
+            except Exception: pass
+            self._after_id = None
+
+    # --- hilo de Tk ---
+    def _show_next(self):
+        if not self.is_running: return
+        try: frame = self._ready.get_nowait()
+        except queue.Empty: frame = None  # el decodificador va tarde: se mantiene el frame actual
+        if frame is not None:
+            self._photo.paste(Image.frombuffer('RGB', self.size, frame, 'raw', 'RGB', 0, 1))
+            self._free.put(frame)
+        now = time.perf_counter() * 1000
+        self._next_due = max(self._next_due + self.frame_ms, now - self.frame_ms)
+        self._after_id = self.root.after(max(1, int(self._next_due - now)), self._show_next)
+
+    # --- hilo decodificador ---
+    def _wait(self, get):
+        while self.is_running:
+            try: return get()
+            except (queue.Empty, queue.Full): pass
+        return None
+
+    def _decode(self):
+        capture, from_cache = self._capture, self.source == self.cache_path
+        writer, tmp_path = None, None
+        if not from_cache:
+            os.makedirs(config.VIDEO_CACHE_DIR, exist_ok=True)
+            tmp_path = self.cache_path[:-len('.avi')] + '.tmp.avi'
+            writer = cv2.VideoWriter(tmp_path, cv2.VideoWriter_fourcc(*'MJPG'), 1000 / self.frame_ms, self.size)
+            if not writer.isOpened(): writer = None
+        raw, written, (width, height) = None, 0, self.size
+        try:
+            while self.is_running:
+                ok, raw = capture.read(raw)
+                if not ok:
+                    if writer is not None and written:
+                        # Primera vuelta completa: a partir de aquí se lee el vídeo ya escalado.
+                        writer.release(); writer = None
+                        os.replace(tmp_path, self.cache_path); _remove_stale_caches(self.video_path, self.cache_path)
+                        capture.release(); capture, from_cache = cv2.VideoCapture(self.cache_path), True
+                    else: capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                    ok, raw = capture.read(raw)
+                    if not ok: break
+                if from_cache: scaled = raw
+                else:
+                    # Se recorta la parte del vídeo que queda visible y solo esa se escala.
+                    src_h, src_w = raw.shape[:2]
+                    crop = raw[:max(1, round(src_h * height / self.scale_size[1])), :max(1, round(src_w * width / self.scale_size[0]))]
+                    scaled = cv2.resize(crop, self.size, dst=self._scaled, interpolation=cv2.INTER_AREA)
+                    if writer is not None:
+                        writer.write(scaled); written += 1
+                frame = self._wait(lambda: self._free.get(timeout=0.1))
+                if frame is None: break
+                cv2.cvtColor(scaled, cv2.COLOR_BGR2RGB, dst=frame)
+                if self._wait(lambda: self._ready.put(frame, timeout=0.1) or True) is None: break
+        except (cv2.error, OSError) as e:
+            print(f"ADVERTENCIA: Error al reproducir el vídeo de fondo: {e}")
+        finally:
+            capture.release()
+            if writer is not None:
+                writer.release()
+                try: os.remove(tmp_path)
+                except OSError: pass
@@ -1,12 +1,16 @@
 # main.py
-import pygame
+# Solo se importa lo necesario para el login; pygame y el juego se cargan
+# después de iniciar sesión (ver startup_report.py para medir el arranque).
 import sys
 import os
 import auth
-from game import Game
+import config
+from profiler import profiler
 
 def main():
     os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    if '--profile' in sys.argv: profiler.set_enabled(True)
+    if '--gpu' in sys.argv: config.RENDERER = 'gpu'
 
     auth_ui = auth.AuthUI()
     current_user = auth_ui.start_login()
@@ -20,6 +24,8 @@ def main():
         print(f"Error: No se pudieron cargar los datos para el usuario {current_user}")
         sys.exit()
 
+    import pygame
+    from game import Game
     game_instance = Game(current_user, user_data)
     game_instance.run()
 
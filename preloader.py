@@ -0,0 +1,65 @@
+# preloader.py
+import queue
+from concurrent.futures import ThreadPoolExecutor
+import config
+
+class AssetPreloader:
+    # Carga assets (spritesheets, sonidos, fondos) en un pool de hilos. Los
+    # resultados vuelven al hilo principal por una cola y se recogen con poll()
+    # una vez por frame, así ninguna escena se queda bloqueada esperando disco.
+    def __init__(self, max_workers=config.PRELOAD_WORKERS):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='preload')
+        self._results = queue.SimpleQueue()
+        self._requested = {}  # clave -> generación de la petición en curso
+        self._generation = 0
+        self._ready = {}
+        self._failed = {}
+
+    def request(self, key, loader, *args):
+        # Encola la carga de 'key' si no se pidió antes. 'loader' corre en un
+        # hilo del pool y no debe tocar estado del juego.
+        if key in self._requested: return
+        self._generation += 1
+        self._requested[key] = self._generation
+        self._pool.submit(self._run, key, self._generation, loader, args)
+
+    def _run(self, key, generation, loader, args):
+        try:
+            self._results.put((key, generation, loader(*args), None))
+        except Exception as e:
+            self._results.put((key, generation, None, e))
+
+    def poll(self):
+        while True:
+            try: key, generation, result, error = self._results.get_nowait()
+            except queue.Empty: return
+            # Resultados de una petición olvidada (o ya sustituida por otra) se descartan.
+            if self._requested.get(key) != generation: continue
+            if error is None: self._ready[key] = result
+            else:
+                print(f"ADVERTENCIA: No se pudo precargar {key}: {error}")
+                self._failed[key] = error
+
+    def is_ready(self, key):
+        # También cuenta como listo si falló: quien lo pida cargará de forma
+        # síncrona y mostrará el error.
+        return key in self._ready or key in self._failed
+
+    def get(self, key):
+        return self._ready.get(key)
+
+    def forget(self, key):
+        # Permite volver a pedir un asset cuyos datos cambiaron.
+        self._requested.pop(key, None); self._ready.pop(key, None); self._failed.pop(key, None)
+
+    def forget_kind(self, kind):
+        # Olvida todas las claves (kind, ...), se hayan usado ya o no.
+        for key in [key for key in self._requested if key[0] == kind]: self.forget(key)
+
+    @property
+    def progress(self):
+        if not self._requested: return 1.0
+        return (len(self._ready) + len(self._failed)) / len(self._requested)
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
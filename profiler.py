@@ -0,0 +1,114 @@
+# profiler.py
+# Medición de tiempos por frame. Game.run marca el inicio de cada frame y
+# envuelve sus fases (eventos, simulación, dibujo, ...) con profiler.phase();
+# las fases pueden anidarse (una escena dentro de 'draw', draw_bg dentro de la
+# escena). Con el perfilador apagado phase() devuelve siempre el mismo objeto
+# vacío, así el coste es una llamada y un if por fase.
+import os
+import time
+from collections import deque
+from datetime import datetime
+import config
+from storage import atomic_write_json
+
+_now_us = lambda: time.perf_counter_ns() // 1000
+
+
+class _NullPhase:
+    def __enter__(self): return self
+    def __exit__(self, *exc): return False
+
+_NULL_PHASE = _NullPhase()
+
+
+class _Phase:
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler, name):
+        self.profiler, self.name = profiler, name
+
+    def __enter__(self):
+        self.start = _now_us()
+        return self
+
+    def __exit__(self, *exc):
+        profiler = self.profiler
+        duration = _now_us() - self.start
+        profiler._events.append((self.name, self.start, duration))
+        profiler._totals[self.name] = profiler._totals.get(self.name, 0) + duration
+        return False
+
+
+class FrameProfiler:
+    def __init__(self, enabled=False, window=config.PROFILER_WINDOW, trace_frames=config.PROFILER_TRACE_FRAMES):
+        self.enabled = enabled
+        self.frame_times = deque(maxlen=window)  # duración total de cada frame (µs)
+        self.phase_times = deque(maxlen=window)  # {fase: µs} de cada frame
+        self.trace = deque(maxlen=trace_frames)  # (inicio, duración, eventos) por frame
+        self._frame_start = None
+        self._events, self._totals = [], {}
+        self._frame_count = 0
+        self._summary, self._summary_frame = None, 0
+
+    def set_enabled(self, enabled):
+        self.enabled = enabled
+        self._frame_start = None
+        if not enabled: self.clear()
+
+    def clear(self):
+        self.frame_times.clear(); self.phase_times.clear(); self.trace.clear()
+        self._events, self._totals = [], {}
+        self._summary = None
+
+    def phase(self, name):
+        if not self.enabled: return _NULL_PHASE
+        return _Phase(self, name)
+
+    def begin_frame(self):
+        # Cierra el frame anterior (de inicio a inicio, espera incluida) y abre
+        # uno nuevo.
+        if not self.enabled: return
+        now = _now_us()
+        if self._frame_start is not None:
+            self.frame_times.append(now - self._frame_start)
+            self.phase_times.append(self._totals)
+            self.trace.append((self._frame_start, now - self._frame_start, self._events))
+            self._frame_count += 1
+        self._frame_start = now
+        self._events, self._totals = [], {}
+
+    def summary(self, every=config.PROFILER_SUMMARY_FRAMES):
+        # Percentiles del tiempo de frame y media por fase (ms) de la ventana.
+        # Se recalcula cada 'every' frames para que el overlay no pese.
+        if self._summary is not None and self._frame_count - self._summary_frame < every: return self._summary
+        self._summary_frame = self._frame_count
+        frames = len(self.frame_times)
+        if not frames:
+            self._summary = None; return None
+        ordered = sorted(self.frame_times)
+        pick = lambda q: ordered[min(frames - 1, int(q * frames))] / 1000
+        totals = {}
+        for phase_totals in self.phase_times:
+            for name, value in phase_totals.items(): totals[name] = totals.get(name, 0) + value
+        phases = sorted(((name, value / frames / 1000) for name, value in totals.items()), key=lambda item: -item[1])
+        mean = sum(ordered) / frames / 1000
+        self._summary = {"frames": frames, "fps": 1000 / mean if mean else 0, "p50": pick(0.50), "p95": pick(0.95),
+                         "p99": pick(0.99), "max": ordered[-1] / 1000, "phases": phases}
+        return self._summary
+
+    def export_chrome_trace(self, path=None):
+        # Formato Trace Event de Chrome; se abre en chrome://tracing, Perfetto
+        # o speedscope (vista de flame graph).
+        if path is None: path = os.path.join(config.PROFILE_DIR, f"trace_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+        pid = os.getpid()
+        events = [{"name": "process_name", "ph": "M", "pid": pid, "tid": 0, "args": {"name": "NEXTGAME"}}]
+        for frame_start, frame_duration, frame_events in self.trace:
+            events.append({"name": "frame", "cat": "frame", "ph": "X", "ts": frame_start, "dur": frame_duration, "pid": pid, "tid": 0})
+            for name, start, duration in frame_events:
+                events.append({"name": name, "cat": "phase", "ph": "X", "ts": start, "dur": duration, "pid": pid, "tid": 0})
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        atomic_write_json(path, {"traceEvents": events, "displayTimeUnit": "ms"}, indent=None)
+        return path
+
+
+profiler = FrameProfiler(enabled=config.PROFILER_ENABLED)
@@ -0,0 +1,154 @@
+# render.py
+# Salida a pantalla. SoftwareRenderer es la de siempre: todo se dibuja sobre la
+# superficie de pygame.display y se envía con display.update(). GpuRenderer usa
+# pygame._sdl2.video (Renderer/Texture): en las escenas de combate fondos,
+# sprites y textos se suben una vez como texturas y el escalado y el volteo
+# los hace el renderer al dibujar. Los menús se siguen dibujando por software
+# en 'screen' y se suben a una textura (solo las franjas que cambiaron).
+#
+# config.RENDERER: 'software', 'gpu' o 'gpu_software' (la ruta de texturas con
+# el renderer por software de SDL; funciona con SDL_VIDEODRIVER=dummy). Si la
+# GPU no está disponible se vuelve al renderizado por software.
+from collections import OrderedDict
+import pygame
+import config
+
+try:
+    from pygame._sdl2.video import Window, Renderer, Texture
+    from pygame._sdl2.sdl2 import error as SDLError
+except ImportError:
+    Window = Renderer = Texture = None
+    SDLError = pygame.error
+
+
+class SoftwareRenderer:
+    accelerated = False
+
+    def __init__(self, size, title):
+        self.resize(size)
+        pygame.display.set_caption(title)
+
+    def resize(self, size):
+        self.screen = pygame.display.set_mode(size, pygame.RESIZABLE)
+        self.canvas = self.screen
+
+    def frame_surface(self):
+        return self.screen
+
+    def present(self, rects=None):
+        if rects is None: pygame.display.update()
+        else: pygame.display.update(rects)
+
+
+class TextureCanvas:
+    # Lo que usan de pygame.Surface las escenas de combate (blit, fill,
+    # tamaño), dibujado con texturas. Cada superficie se sube una vez y se
+    # reutiliza mientras siga en la caché; no hay que modificar una superficie
+    # ya dibujada (para eso está forget()).
+    def __init__(self, renderer, size):
+        self.renderer = renderer
+        self.size = tuple(size)
+        self.drawn = False  # True si este frame se ha dibujado aquí y no en 'screen'
+        self._textures = OrderedDict()
+        self._stream, self._stream_source = None, None
+
+    def texture(self, surface):
+        texture = self._textures.get(surface)
+        if texture is not None:
+            self._textures.move_to_end(surface)
+            return texture
+        texture = Texture.from_surface(self.renderer, surface)
+        self._textures[surface] = texture
+        if len(self._textures) > config.TEXTURE_CACHE_LIMIT: self._textures.popitem(last=False)
+        return texture
+
+    def forget(self, surface):
+        self._textures.pop(surface, None)
+
+    def _begin(self):
+        if self.drawn: return
+        self.renderer.draw_color = pygame.Color(config.BLACK)
+        self.renderer.clear()
+        self.drawn = True
+
+    def get_size(self): return self.size
+    def get_width(self): return self.size[0]
+    def get_height(self): return self.size[1]
+    def get_rect(self, **kwargs):
+        rect = pygame.Rect((0, 0), self.size)
+        for name, value in kwargs.items(): setattr(rect, name, value)
+        return rect
+
+    def blit(self, source, dest):
+        self._begin()
+        self.texture(source).draw(dstrect=(dest[0], dest[1], source.get_width(), source.get_height()))
+
+    def blit_scaled(self, source, rect):
+        self._begin()
+        self.texture(source).draw(dstrect=rect)
+
+    def blit_streamed(self, source, rect):
+        # Superficies que cambian cada pocos frames (fondos animados): se copian
+        # a una sola textura en lugar de llenar la caché.
+        self._begin()
+        if self._stream is None or (self._stream.width, self._stream.height) != source.get_size():
+            self._stream, self._stream_source = Texture(self.renderer, source.get_size(), streaming=True), None
+        if self._stream_source is not source:
+            self._stream.update(source); self._stream_source = source
+        self._stream.draw(dstrect=rect)
+
+    def blit_sprite(self, image, flipped_image, flip, dest):
+        # Solo se sube el frame original; el volteado lo hace el renderer.
+        self._begin()
+        self.texture(image).draw(dstrect=(dest[0], dest[1], image.get_width(), image.get_height()), flip_x=bool(flip))
+
+    def fill(self, color, rect=None):
+        self._begin()
+        self.renderer.draw_color = pygame.Color(color)
+        self.renderer.fill_rect(rect if rect is not None else (0, 0, *self.size))
+
+
+class GpuRenderer:
+    accelerated = True
+
+    def __init__(self, size, title, software=False):
+        if Renderer is None: raise SDLError("pygame._sdl2.video no está disponible")
+        # pygame.display necesita un modo de vídeo para convert()/convert_alpha();
+        # se abre oculto y se dibuja en una ventana aparte con su renderer.
+        pygame.display.set_mode((1, 1), pygame.HIDDEN)
+        self.window = Window(title, size, resizable=True)
+        try: self.renderer = Renderer(self.window, accelerated=0 if software else 1)
+        except SDLError:
+            self.window.destroy(); raise
+        self.canvas = TextureCanvas(self.renderer, size)
+        self.resize(size)
+
+    def resize(self, size):
+        self.window.size = size
+        self.screen = pygame.Surface(size).convert()  # lienzo de los menús
+        self._screen_texture = Texture(self.renderer, size, streaming=True)
+        self._screen_texture.update(self.screen)
+        self.canvas.size = tuple(size)
+
+    def frame_surface(self):
+        return self.canvas if self.canvas.drawn else self.screen
+
+    def present(self, rects=None):
+        if not self.canvas.drawn:
+            if rects is None: self._screen_texture.update(self.screen)
+            else:
+                for rect in rects: self._screen_texture.update(self.screen.subsurface(rect), area=rect)
+            self._screen_texture.draw()
+        self.canvas.drawn = False
+        self.renderer.present()
+
+
+def create_renderer(size, title, kind=None):
+    kind = kind or config.RENDERER
+    if kind in ('gpu', 'gpu_software'):
+        try: return GpuRenderer(size, title, software=kind == 'gpu_software')
+        except (SDLError, pygame.error) as e:
+            print(f"ADVERTENCIA: No se pudo iniciar el renderizado por GPU ({e}). Se usa el de software.")
+    elif kind != 'software':
+        print(f"ADVERTENCIA: Renderizador '{kind}' desconocido. Se usa el de software.")
+    return SoftwareRenderer(size, title)
@@ -0,0 +1,190 @@
+# replay.py
+# Repeticiones de combates. Formato del archivo .dkr:
+#   MAGIC | largo de la cabecera (uint32) | cabecera JSON
+#   tramos (repeticiones, máscara de entrada) en varints, uno por cada cambio
+#   de la entrada del jugador 1
+#   tramo vacío (0) | ganador (0 empate, 1 o 2) | ticks totales
+# La cabecera guarda mapa, arena y, por jugador, personaje, posición
+# inicial y los datos de combate con los que se jugó, así la repetición no
+# depende de cambios posteriores en characters.json. El archivo se escribe
+# mientras se juega; si el juego se cierra a mitad queda sin el final pero se
+# puede reproducir igual.
+import os
+import sys
+import json
+import time
+import struct
+import argparse
+from datetime import datetime
+import config
+from simulation import FighterCore, SimRect, MatchState, FIGHTER_SIZE
+from collision import CharacterBoxes
+
+REPLAY_MAGIC = b'DKREPLAY'
+REPLAY_VERSION = 1
+_HEADER = struct.Struct('<8sI')
+
+def _write_varint(f, value):
+    out = bytearray()
+    while True:
+        byte = value & 0x7F; value >>= 7
+        if value: out.append(byte | 0x80)
+        else: out.append(byte); break
+    f.write(out)
+
+def _read_varint(f):
+    value = shift = 0
+    while True:
+        data = f.read(1)
+        if not data: raise EOFError
+        value |= (data[0] & 0x7F) << shift
+        if not data[0] & 0x80: return value
+        shift += 7
+
+def replay_path(p1_char, p2_char, when=None):
+    when = when or datetime.now()
+    safe = lambda name: ''.join(c if c.isalnum() else '_' for c in name)
+    return os.path.join(config.REPLAY_DIR, f"{when.strftime('%Y%m%d_%H%M%S_%f')[:-3]}_{safe(p1_char)}_vs_{safe(p2_char)}.dkr")
+
+def fighter_header(fighter, character):
+    header = {"username": fighter.username, "character": character, "x": fighter.rect.x, "y": fighter.rect.y,
+              "flip": bool(fighter.flip), "ai": fighter.ai, "frame_counts": list(fighter.frame_counts),
+              "stats": {"health": fighter.base_health, "speed": fighter.speed}, "special_moves": fighter.special_moves}
+    if fighter.boxes is not None: header["boxes"] = fighter.boxes.data
+    return header
+
+def fighter_boxes(player):
+    boxes = player.get("boxes")
+    return CharacterBoxes(boxes["hurtboxes"], boxes["hitboxes"]) if boxes else None
+
+def make_header(map_key, arena, players):
+    return {"version": REPLAY_VERSION, "tick_rate": config.SIM_TICK_RATE, "map": map_key,
+            "arena": list(arena), "intro_count": MatchState.INTRO_COUNT, "players": players}
+
+
+class ReplayWriter:
+    def __init__(self, path, header):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._file = open(path, 'wb')
+        header_bytes = json.dumps(header, ensure_ascii=False).encode('utf-8')
+        self._file.write(_HEADER.pack(REPLAY_MAGIC, len(header_bytes)) + header_bytes)
+        self._bits, self._run = None, 0
+
+    def write(self, input_bits):
+        # Una llamada por tick; solo se escribe cuando la entrada cambia.
+        if input_bits == self._bits:
+            self._run += 1; return
+        self._flush_run()
+        self._bits, self._run = input_bits, 1
+
+    def _flush_run(self):
+        if self._run:
+            _write_varint(self._file, self._run); _write_varint(self._file, self._bits)
+
+    def finish(self, winner_player, total_ticks):
+        self._flush_run(); self._run = 0
+        _write_varint(self._file, 0); _write_varint(self._file, winner_player); _write_varint(self._file, total_ticks)
+        self.close()
+
+    def close(self):
+        if not self._file.closed: self._file.close()
+
+
+class ReplayReader:
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            magic, header_len = _HEADER.unpack(self._file.read(_HEADER.size))
+            if magic != REPLAY_MAGIC: raise ValueError("no es un archivo de repetición")
+            self.header = json.loads(self._file.read(header_len).decode('utf-8'))
+            if self.header.get("version") != REPLAY_VERSION: raise ValueError(f"versión {self.header.get('version')} no soportada")
+        except (struct.error, ValueError):
+            self._file.close(); raise
+        self._bits, self._run = 0, 0
+        self.finished = False
+        self.result = None  # (ganador, ticks) si el archivo está completo
+
+    def next_input(self):
+        # Máscara del siguiente tick, o None al terminar la grabación.
+        if self._run == 0:
+            if self.finished: return None
+            try:
+                run = _read_varint(self._file)
+                if run == 0:
+                    self.result = (_read_varint(self._file), _read_varint(self._file))
+                    self.close(); return None
+                self._bits, self._run = _read_varint(self._file), run
+            except EOFError:
+                self.close(); return None
+        self._run -= 1
+        return self._bits
+
+    def close(self):
+        self.finished = True
+        if not self._file.closed: self._file.close()
+
+
+def prune_replays(history, limit=None):
+    # Borra repeticiones que ya no están en el historial, salvo las 'limit'
+    # más recientes (puede haber una en curso o a punto de guardarse).
+    if limit is None: limit = config.BATTLE_HISTORY_LIMIT
+    try: names = sorted((n for n in os.listdir(config.REPLAY_DIR) if n.endswith('.dkr')), reverse=True)
+    except FileNotFoundError: return
+    referenced = {os.path.normpath(r["replay"]) for r in history if r.get("replay")}
+    for name in names[limit:]:
+        path = os.path.join(config.REPLAY_DIR, name)
+        if os.path.normpath(path) in referenced: continue
+        try: os.remove(path)
+        except OSError as e: print(f"ADVERTENCIA: No se pudo borrar la repetición '{path}': {e}")
+
+# ==============================================================================
+# REPRODUCCIÓN SIN PANTALLA
+# ==============================================================================
+def replay_match(header, fighter_1, fighter_2):
+    match = MatchState(fighter_1, fighter_2, tuple(header["arena"]))
+    match.intro_count = header.get("intro_count", MatchState.INTRO_COUNT)
+    return match
+
+def headless_match(header):
+    fighters = []
+    for i, player in enumerate(header["players"]):
+        rect = SimRect(player["x"], player["y"], *FIGHTER_SIZE)
+        fighters.append(FighterCore(i + 1, rect, player["flip"], player["frame_counts"], player["stats"],
+                                    player["special_moves"], ai=player["ai"], username=player["username"], boxes=fighter_boxes(player)))
+    return replay_match(header, *fighters)
+
+def simulate_replay(path):
+    # Re-simula la repetición tan rápido como se pueda. Devuelve
+    # (ganador re-simulado, ticks, resultado grabado o None).
+    reader = ReplayReader(path)
+    match = headless_match(reader.header)
+    winner = None
+    while True:
+        input_bits = reader.next_input()
+        if input_bits is None: break
+        result = match.step(input_bits)
+        if result is not None: winner = result.player
+    return winner or 0, match.ticks, reader.result
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-simula repeticiones .dkr sin pantalla y comprueba su resultado.")
+    parser.add_argument('paths', nargs='+')
+    args = parser.parse_args()
+    failed = False
+    for path in args.paths:
+        try:
+            start = time.perf_counter()
+            winner, ticks, recorded = simulate_replay(path)
+            elapsed = time.perf_counter() - start
+        except (OSError, ValueError) as e:
+            print(f"{path}: error: {e}"); failed = True; continue
+        speed = (ticks / config.SIM_TICK_RATE) / elapsed if elapsed > 0 else float('inf')
+        status = "sin final grabado" if recorded is None else ("OK" if recorded == (winner, ticks) else f"DISTINTO (grabado {recorded})")
+        print(f"{path}: ganador jugador {winner}, {ticks} ticks, x{speed:.0f} tiempo real, {status}")
+        failed = failed or (recorded is not None and recorded != (winner, ticks))
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+# simulate.py
+# Simulador de balance: juega combates IA contra IA sin ventana, sonido ni
+# guardado de estado, y resume tasas de victoria, duración media y DPS por
+# movimiento. Uso: python simulate.py -n 1000
+# Con --engine batch (requiere numpy) usa el motor vectorizado, y con
+# --health/--speed/--cooldown-scale barre una malla de parámetros.
+import os
+import sys
+import time
+import argparse
+import config
+from simulation import run_balance
+from storage import get_backend, atomic_write_json
+
+def print_report(report, elapsed):
+    total_matches = sum(p["matches"] for p in report["pairings"])
+    rate = total_matches / elapsed if elapsed > 0 else 0
+    print(f"{total_matches} combates en {elapsed:.2f} s ({rate:.0f} combates/s)\n")
+    print(f"{'Pareja':<40}{'Victorias':>22}{'Empates':>9}{'Duración':>10}")
+    for pairing in report["pairings"]:
+        name_a, name_b = pairing["pair"]
+        wins = f"{pairing['win_rate'][name_a]:.1%} / {pairing['win_rate'][name_b]:.1%}"
+        print(f"{name_a + ' vs ' + name_b:<40}{wins:>22}{pairing['draws']:>9}{pairing['avg_match_seconds']:>9.1f}s")
+    print()
+    for name, summary in report["characters"].items():
+        print(f"{name}: {summary['win_rate']:.1%} de victorias en {summary['matches']} combates")
+        for key, move in summary["moves"].items():
+            print(f"    {key:<8} usos {move['uses']:>8}  acierto {move['hit_rate']:>6.1%}  DPS {move['dps']:>6.2f}")
+
+def print_sweep(rows, elapsed):
+    total_matches = sum(row["matches"] for row in rows)
+    print(f"{total_matches} combates en {elapsed:.2f} s\n")
+    print(f"{'Personaje':<20}{'Salud':>7}{'Vel.':>6}{'Cooldown':>10}{'Victorias':>11}{'Duración':>10}")
+    for row in sorted(rows, key=lambda r: (r["character"], r["health"], r["speed"], r["cooldown_scale"])):
+        print(f"{row['character']:<20}{row['health']:>7}{row['speed']:>6}{row['cooldown_scale']:>9.2f}x{row['win_rate']:>11.1%}{row['avg_match_seconds']:>9.1f}s")
+
+def main():
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Simulación masiva de combates IA contra IA para balancear personajes.")
+    parser.add_argument('-n', '--matches', type=int, default=100, help="combates por pareja de personajes")
+    parser.add_argument('-w', '--workers', type=int, default=None, help="procesos a usar (por defecto, uno por CPU)")
+    parser.add_argument('--seed', default=0, help="semilla base; misma semilla, mismos resultados")
+    parser.add_argument('--characters', nargs='+', help="limitar a estos personajes")
+    parser.add_argument('--json', help="guardar el informe completo en este archivo")
+    parser.add_argument('--engine', choices=['scalar', 'batch'], default='scalar', help="motor de simulación")
+    parser.add_argument('--verify', action='store_true', help="comprobar que el motor vectorizado coincide con el escalar")
+    parser.add_argument('--health', type=int, nargs='+', help="valores de salud a barrer")
+    parser.add_argument('--speed', type=int, nargs='+', help="valores de velocidad a barrer")
+    parser.add_argument('--cooldown-scale', type=float, nargs='+', help="factores de cooldown a barrer")
+    args = parser.parse_args()
+    sweeping = args.health or args.speed or args.cooldown_scale
+    if args.engine == 'batch' or args.verify or sweeping:
+        import batch_simulation  # numpy solo hace falta en estos modos
+
+    characters = get_backend().load_characters()
+    if args.characters:
+        missing = [name for name in args.characters if name not in characters]
+        if missing: sys.exit(f"Error: personajes desconocidos: {', '.join(missing)}")
+        characters = {name: characters[name] for name in args.characters}
+    if len(characters) < 2: sys.exit("Error: se necesitan al menos dos personajes.")
+    if args.engine == 'batch' or args.verify or sweeping:
+        unsupported = [name for name, data in characters.items() if not batch_simulation.supports(data)]
+        if unsupported:
+            # El resto del plantel se sigue pudiendo simular en el motor vectorizado.
+            print(f"ADVERTENCIA: el motor vectorizado no soporta hitboxes ni proyectiles; se omiten {', '.join(unsupported)} (usa --engine scalar)")
+            characters = {name: data for name, data in characters.items() if name not in unsupported}
+            if len(characters) < 2: sys.exit("Error: quedan menos de dos personajes para el motor vectorizado; usa --engine scalar")
+
+    arena = config.RESOLUTIONS[0]
+    start = time.perf_counter()
+    if args.verify:
+        total, mismatches = batch_simulation.verify_against_scalar(characters, args.matches, seed=args.seed, arena=arena)
+        print(f"{total - len(mismatches)} de {total} combates idénticos en ambos motores")
+        for mismatch in mismatches[:10]: print(f"  {mismatch}")
+        if mismatches: sys.exit(1)
+        return
+    if sweeping:
+        report = batch_simulation.sweep(characters, args.matches, args.health, args.speed, args.cooldown_scale, seed=args.seed, arena=arena)
+        print_sweep(report, time.perf_counter() - start)
+    else:
+        if args.engine == 'batch': report = batch_simulation.run_balance_batch(characters, args.matches, seed=args.seed, arena=arena)
+        else: report = run_balance(characters, args.matches, workers=args.workers, seed=args.seed, arena=arena)
+        print_report(report, time.perf_counter() - start)
+    if args.json:
+        atomic_write_json(args.json, report)
+        print(f"\nInforme guardado en {args.json}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,463 @@
+# simulation.py
+import hashlib
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+import config
+from collision import CharacterBoxes, CollisionWorld, overlaps, place_box, uses_projectiles
+
+# ==============================================================================
+# NÚCLEO DE COMBATE SIN PYGAME
+# ==============================================================================
+# Reglas de movimiento, ataque y animación de un luchador. No usa pantalla,
+# sonido ni disco: Fighter (fighter.py) hereda de FighterCore y añade frames,
+# sonido y persistencia; el simulador masivo lo usa directamente con SimRect.
+
+class SimRect:
+    # Lo mínimo de pygame.Rect que usa la lógica de combate.
+    __slots__ = ('x', 'y', 'width', 'height')
+
+    def __init__(self, x, y, width, height):
+        self.x, self.y, self.width, self.height = int(x), int(y), int(width), int(height)
+
+    @property
+    def left(self): return self.x
+    @property
+    def right(self): return self.x + self.width
+    @property
+    def top(self): return self.y
+    @property
+    def bottom(self): return self.y + self.height
+    @property
+    def centerx(self): return self.x + self.width // 2
+
+    def colliderect(self, other):
+        return (self.width > 0 and self.height > 0 and other.width > 0 and other.height > 0
+                and self.x < other.x + other.width and other.x < self.x + self.width
+                and self.y < other.y + other.height and other.y < self.y + self.height)
+
+
+# Entrada del jugador en un tick, como máscara de bits: izquierda, derecha,
+# salto y un bit por movimiento especial en el orden de 'special_moves'.
+INPUT_LEFT = 1
+INPUT_RIGHT = 2
+INPUT_JUMP = 4
+INPUT_MOVE_SHIFT = 3
+
+def move_bit(move_index):
+    return 1 << (INPUT_MOVE_SHIFT + move_index)
+
+
+class FighterCore:
+    # El estado vive en __slots__ (sin __dict__ por instancia): ocupa menos y
+    # move()/update() acceden más rápido. Primero el estado que toca cada
+    # tick, luego los datos del personaje y de colisiones. Las subclases
+    # declaran sus propios __slots__ para gráficos, sonido o estadísticas.
+    __slots__ = ('rect', 'vel_y', 'jump_state', 'running', 'attacking', 'attack_type', 'attack_cooldown', 'hit',
+                 'health', 'alive', 'flip', 'action', 'frame_index', 'anim_ticks', 'prev_x', 'prev_y', 'input_bits',
+                 'player', 'ai', 'username', 'frame_counts', 'base_health', 'speed', 'special_moves',
+                 'attacks_done', 'specials_used_in_match',
+                 'boxes', 'world', 'team', 'entity_id', 'active_move', 'attack_target', 'struck')
+    # Ticks de simulación que dura cada frame de animación. Antes se avanzaba
+    # cuando habían pasado más de 50 ms, es decir, al cuarto frame a 60 FPS
+    # (~67 ms); se mantiene ese ritmo para no cambiar ataques ni aturdimientos.
+    ANIMATION_TICKS = int(50 * config.SIM_TICK_RATE / 1000) + 1
+
+    def __init__(self, player, rect, flip, frame_counts, stats, special_moves, ai=False, username=None, boxes=None):
+        self.player = player
+        self.rect = rect
+        self.flip = flip
+        self.frame_counts = frame_counts  # frames por fila de animación
+        self.ai = ai
+        self.username = username
+
+        self.base_health = stats.get('health', 100)
+        self.speed = stats.get('speed', 10)
+        self.special_moves = special_moves
+
+        self.action = 0
+        self.frame_index = 0
+        self.anim_ticks = 0
+        # Posición al inicio del último tick, para interpolar al dibujar.
+        self.prev_x, self.prev_y = self.rect.x, self.rect.y
+        self.vel_y = 0
+        self.running = False
+        self.jump_state = False
+        self.attacking = False
+        self.attack_type = 0
+        self.attack_cooldown = 0
+        self.hit = False
+        self.health = self.base_health
+        self.alive = True
+        self.attacks_done = 0
+        self.specials_used_in_match = 0 # <-- NUEVO: Contador para misiones
+        self.input_bits = 0  # entrada del jugador humano en el tick actual
+        # Colisiones (collision.py): cajas del personaje (None = rect entero y
+        # golpe instantáneo), mundo del combate si lo hay y equipo.
+        self.boxes = boxes
+        self.world = None
+        self.team, self.entity_id = player, player
+        self.active_move, self.attack_target, self.struck = None, None, []
+
+    # --- Puntos de extensión ---
+    def read_movement(self):
+        # (izquierda, derecha) pulsadas por el jugador humano.
+        return self.input_bits & INPUT_LEFT, self.input_bits & INPUT_RIGHT
+
+    def choose_move(self):
+        return next(iter(self.special_moves))
+
+    def on_attack(self, move_key, damage):
+        # Se llama en cada ataque lanzado con el daño hecho al lanzarlo (0 si
+        # no conectó o si golpea después, con hitboxes por frame o proyectil).
+        pass
+
+    def on_hit(self, move_key, damage):
+        # Se llama cada vez que un ataque de este luchador daña a alguien.
+        pass
+
+    def show_frame(self):
+        pass
+
+    # --- Reglas ---
+    def move(self, screen_width, screen_height, target, round_over):
+        # Se llama una vez por tick de simulación (config.SIM_TICK_RATE), no por
+        # frame dibujado; todas las constantes están expresadas por tick.
+        SPEED = self.speed
+        GRAVITY = 2
+        dx, dy = 0, 0
+        self.prev_x, self.prev_y = self.rect.x, self.rect.y
+        self.running = False
+        center_x, target_x = self.rect.centerx, target.rect.centerx
+        if not self.attacking and self.alive and not round_over:
+            if self.ai:
+                if center_x < target_x - 30: dx = SPEED
+                elif center_x > target_x + 30: dx = -SPEED
+                if abs(center_x - target_x) < 150 and not self.attacking:
+                    if self.special_moves and self.attack_cooldown == 0:
+                        self.attack(target, self.choose_move())
+            else:
+                move_left, move_right = self.read_movement()
+                if move_left: dx = -SPEED; self.running = True
+                if move_right: dx = SPEED; self.running = True
+        self.vel_y += GRAVITY
+        dy += self.vel_y
+        if self.rect.left + dx < 0: dx = -self.rect.left
+        if self.rect.right + dx > screen_width: dx = screen_width - self.rect.right
+        if self.rect.bottom + dy > screen_height - 110:
+            self.vel_y = 0; self.jump_state = False
+            dy = screen_height - 110 - self.rect.bottom
+        self.flip = target_x < center_x
+        if self.attack_cooldown > 0: self.attack_cooldown -= 1
+        self.rect.x += dx; self.rect.y += dy
+        if self.world is not None: self.world.moved(self)
+
+    def jump(self):
+        if not self.jump_state and self.alive:
+            self.vel_y = -30
+            self.jump_state = True
+
+    def attack(self, target, move_key):
+        if self.attack_cooldown == 0 and not self.attacking and self.alive:
+            move_data = self.special_moves[move_key]
+            self.attacking = True
+            self.attack_type = move_data["animation_row"]
+            self.attacks_done += 1
+            self.specials_used_in_match += 1 # <-- NUEVO: Incrementar contador
+            damage = 0
+            self.struck = []
+            if "projectile" in move_data and self.world is not None:
+                self.world.spawn_projectile(self, move_key, move_data)
+            elif self.boxes is not None and self.attack_type in self.boxes.hitbox_rows:
+                # Golpea en los frames de la animación que tienen hitboxes (update).
+                self.active_move, self.attack_target = move_key, target
+            else:
+                attacking_box = (self.rect.centerx - (2 * self.rect.width * self.flip), self.rect.y, 2 * self.rect.width, self.rect.height)
+                damage = self.strike(attacking_box, move_key, move_data.get("damage", 10), target)
+            self.on_attack(move_key, damage)
+            self.attack_cooldown = move_data.get("cooldown", 20)
+
+    def hurtboxes(self):
+        rect = self.rect
+        boxes = self.boxes.hurtboxes_at(self.action, self.frame_index) if self.boxes is not None else None
+        if not boxes: return [(rect.x, rect.y, rect.width, rect.height)]
+        return [place_box(rect, box, self.flip) for box in boxes]
+
+    def is_hit_by(self, box):
+        return any(overlaps(box, hurtbox) for hurtbox in self.hurtboxes())
+
+    def strike(self, box, move_key, damage, target):
+        # Aplica el golpe a quien toque 'box': todos los rivales del mundo vía
+        # la rejilla, o solo 'target' si el luchador no está en un mundo. Cada
+        # rival recibe como mucho un golpe por ataque.
+        if self.world is not None: victims = self.world.targets_in(box, self)
+        else: victims = [target] if target.is_hit_by(box) else []
+        total = 0
+        for victim in victims:
+            if victim in self.struck: continue
+            self.struck.append(victim)
+            self.deal_damage(victim, move_key, damage); total += damage
+        return total
+
+    def deal_damage(self, target, move_key, damage):
+        target.health -= damage
+        target.hit = True
+        self.on_hit(move_key, damage)
+
+    def _strike_active_frame(self):
+        if not self.attacking or self.action != self.attack_type:
+            self.active_move = None; return
+        damage = self.special_moves[self.active_move].get("damage", 10)
+        for box in self.boxes.hitboxes_at(self.action, self.frame_index):
+            self.strike(place_box(self.rect, box, self.flip), self.active_move, damage, self.attack_target)
+
+    def update(self):
+        # Avanza la animación un tick de simulación. Devuelve False si la
+        # acción actual no tiene frames y se volvió a 'Idle'.
+        if self.health <= 0: self.health, self.alive = 0, False; self.update_action(6)
+        elif self.hit: self.update_action(5)
+        elif self.attacking: self.update_action(self.attack_type)
+        elif self.jump_state: self.update_action(2)
+        elif self.running: self.update_action(1)
+        else: self.update_action(0)
+
+        if self.action >= len(self.frame_counts) or not self.frame_counts[self.action]:
+            self.update_action(0)
+            if self.world is not None: self.world.moved(self)
+            return False
+
+        if self.frame_index >= self.frame_counts[self.action]:
+            if not self.alive:
+                self.frame_index = self.frame_counts[self.action] - 1
+            else:
+                self.frame_index = 0
+                if self.attacking: self.attacking = False
+                if self.hit: self.hit = False
+
+        self.show_frame()
+        if self.active_move is not None: self._strike_active_frame()
+        if self.world is not None: self.world.moved(self)
+        self.anim_ticks += 1
+        if self.anim_ticks >= self.ANIMATION_TICKS:
+            self.frame_index += 1
+            self.anim_ticks = 0
+        return True
+
+    def update_action(self, new_action):
+        if new_action != self.action:
+            self.action, self.frame_index, self.anim_ticks = new_action, 0, 0
+
+def apply_player_input(fighter, target, input_bits):
+    fighter.input_bits = input_bits
+    if input_bits & INPUT_JUMP: fighter.jump()
+    for i, move_key in enumerate(fighter.special_moves):
+        if input_bits & move_bit(i): fighter.attack(target, move_key)
+
+
+class MatchState:
+    # Un combate de Game tick a tick: cuenta atrás inicial, entrada del jugador
+    # 1, movimiento, animación y fin de ronda. Lo usan el juego y el
+    # reproductor de repeticiones, así una repetición se re-simula igual.
+    INTRO_COUNT = 3
+
+    def __init__(self, fighter_1, fighter_2, arena):
+        self.fighter_1, self.fighter_2 = fighter_1, fighter_2
+        self.arena = arena
+        self.intro_count, self.intro_ticks = self.INTRO_COUNT, 0
+        self.round_over, self.round_over_ticks = False, 0
+        self.ticks = 0
+        self.world = CollisionWorld(arena)
+        self.world.add(fighter_1); self.world.add(fighter_2)
+
+    def step(self, input_bits):
+        # Avanza un tick; devuelve el luchador ganador en el tick en que
+        # termina la ronda y None en el resto.
+        self.ticks += 1
+        fighter_1, fighter_2 = self.fighter_1, self.fighter_2
+        apply_player_input(fighter_1, fighter_2, input_bits)
+        if self.intro_count <= 0:
+            screen_width, screen_height = self.arena
+            fighter_1.move(screen_width, screen_height, fighter_2, self.round_over)
+            fighter_2.move(screen_width, screen_height, fighter_1, self.round_over)
+            self.world.step()
+        else:
+            self.intro_ticks += 1
+            if self.intro_ticks >= config.SIM_TICK_RATE:
+                self.intro_count -= 1; self.intro_ticks = 0
+        fighter_1.update(); fighter_2.update()
+        if self.round_over:
+            self.round_over_ticks += 1
+            return None
+        winner = None
+        if not fighter_1.alive: winner = fighter_2
+        elif not fighter_2.alive: winner = fighter_1
+        if winner is not None: self.round_over, self.round_over_ticks = True, 0
+        return winner
+
+# ==============================================================================
+# SIMULACIÓN MASIVA IA CONTRA IA
+# ==============================================================================
+SPAWN_POSITIONS = (200, 700)  # x inicial de los jugadores 1 y 2, como en Game
+SPAWN_Y = 310
+FIGHTER_SIZE = (80, 180)
+
+# El azar de la IA no usa un RNG con estado sino un hash de (semilla, jugador,
+# tick): así el motor vectorizado (batch_simulation.py) reproduce exactamente
+# las mismas decisiones sin depender del orden en que se consumen números.
+MASK64 = (1 << 64) - 1
+ROLL_PLAYER_MUL = 0x9E3779B97F4A7C15
+ROLL_TICK_MUL = 0xD1B54A32D192ED03
+
+def mix64(x):
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & MASK64
+    return x ^ (x >> 31)
+
+def move_roll(seed, player, tick):
+    return mix64((seed + player * ROLL_PLAYER_MUL + tick * ROLL_TICK_MUL) & MASK64)
+
+def match_seed(*parts):
+    # Semilla entera de 64 bits estable entre procesos y ejecuciones.
+    text = ':'.join(str(part) for part in parts)
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'little')
+
+class HeadlessFighter(FighterCore):
+    # Luchador IA para el simulador: elige al azar entre sus movimientos
+    # especiales (reproducible a partir de la semilla) y anota el daño de cada uno.
+    __slots__ = ('seed', 'tick', 'move_keys', 'move_stats')
+
+    def __init__(self, player, char_name, char_data, seed):
+        frame_counts = list(char_data.get("animation_steps", []))
+        if not frame_counts: frame_counts = [1]
+        elif not frame_counts[0]: frame_counts[0] = 1  # igual que el placeholder de Fighter
+        x = SPAWN_POSITIONS[player - 1]
+        super().__init__(player, SimRect(x, SPAWN_Y, *FIGHTER_SIZE), player == 2, frame_counts,
+                         char_data.get("stats", {}), char_data.get("special_moves", {}), ai=True, username=char_name,
+                         boxes=CharacterBoxes.from_character(char_data))
+        self.seed = seed
+        self.tick = 0
+        self.move_keys = list(self.special_moves)
+        self.move_stats = {key: [0, 0, 0] for key in self.move_keys}  # usos, aciertos, daño
+
+    def choose_move(self):
+        return self.move_keys[move_roll(self.seed, self.player, self.tick) % len(self.move_keys)]
+
+    def on_attack(self, move_key, damage):
+        self.move_stats[move_key][0] += 1
+
+    def on_hit(self, move_key, damage):
+        stats = self.move_stats[move_key]
+        stats[1] += 1; stats[2] += damage
+
+
+def simulate_match(name_1, data_1, name_2, data_2, seed, arena=None, max_ticks=None):
+    # Juega un combate IA contra IA sin intro ni persistencia. Devuelve
+    # (ganador o None si empate, ticks jugados, luchador 1, luchador 2).
+    screen_width, screen_height = arena or config.RESOLUTIONS[0]
+    if max_ticks is None: max_ticks = config.SIM_MAX_MATCH_SECONDS * config.SIM_TICK_RATE
+    fighter_1 = HeadlessFighter(1, name_1, data_1, seed)
+    fighter_2 = HeadlessFighter(2, name_2, data_2, seed)
+    # El mundo de colisiones solo hace falta para los proyectiles; sin él los
+    # ataques se comprueban directamente contra el rival.
+    world = None
+    if uses_projectiles(data_1) or uses_projectiles(data_2):
+        world = CollisionWorld((screen_width, screen_height))
+        world.add(fighter_1); world.add(fighter_2)
+    ticks = 0
+    while ticks < max_ticks:
+        ticks += 1
+        fighter_1.tick = fighter_2.tick = ticks
+        fighter_1.move(screen_width, screen_height, fighter_2, False)
+        fighter_2.move(screen_width, screen_height, fighter_1, False)
+        if world is not None: world.step()
+        fighter_1.update(); fighter_2.update()
+        if not fighter_1.alive or not fighter_2.alive: break
+    winner = None
+    if not fighter_1.alive and fighter_2.alive: winner = name_2
+    elif not fighter_2.alive and fighter_1.alive: winner = name_1
+    return winner, ticks, fighter_1, fighter_2
+
+
+def _empty_result(name_a, name_b):
+    return {"pair": [name_a, name_b], "matches": 0, "wins": {name_a: 0, name_b: 0}, "draws": 0, "ticks": 0,
+            "moves": {name_a: {}, name_b: {}}}
+
+
+def simulate_pairing(name_a, data_a, name_b, data_b, first_match, count, seed, arena=None):
+    # Juega 'count' combates de la pareja alternando lados (el jugador 1 se
+    # mueve primero en cada tick) y acumula los resultados.
+    result = _empty_result(name_a, name_b)
+    for i in range(first_match, first_match + count):
+        seed_i = match_seed(seed, name_a, name_b, i)
+        if i % 2 == 0: winner, ticks, f1, f2 = simulate_match(name_a, data_a, name_b, data_b, seed_i, arena)
+        else: winner, ticks, f1, f2 = simulate_match(name_b, data_b, name_a, data_a, seed_i, arena)
+        result["matches"] += 1; result["ticks"] += ticks
+        if winner is None: result["draws"] += 1
+        else: result["wins"][winner] += 1
+        for fighter in (f1, f2):
+            totals = result["moves"][fighter.username]
+            for key, (uses, hits, damage) in fighter.move_stats.items():
+                entry = totals.setdefault(key, [0, 0, 0])
+                entry[0] += uses; entry[1] += hits; entry[2] += damage
+    return result
+
+
+def _merge_results(into, other):
+    into["matches"] += other["matches"]; into["draws"] += other["draws"]; into["ticks"] += other["ticks"]
+    for name, wins in other["wins"].items(): into["wins"][name] += wins
+    for name, moves in other["moves"].items():
+        for key, values in moves.items():
+            entry = into["moves"][name].setdefault(key, [0, 0, 0])
+            for j, value in enumerate(values): entry[j] += value
+
+
+def run_balance(characters, matches_per_pair, workers=None, seed=0, chunk_size=None, arena=None):
+    # Juega todas las parejas de personajes distintos 'matches_per_pair' veces
+    # repartidas en varios procesos y devuelve un informe agregado.
+    names = list(characters)
+    pairs = list(itertools.combinations(names, 2))
+    if chunk_size is None: chunk_size = config.SIM_CHUNK_SIZE
+    results = {pair: _empty_result(*pair) for pair in pairs}
+    tasks = []
+    for name_a, name_b in pairs:
+        for first in range(0, matches_per_pair, chunk_size):
+            count = min(chunk_size, matches_per_pair - first)
+            tasks.append((name_a, characters[name_a], name_b, characters[name_b], first, count, seed, arena))
+    if workers == 1:
+        partials = [simulate_pairing(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            partials = list(pool.map(simulate_pairing, *zip(*tasks))) if tasks else []
+    for partial in partials: _merge_results(results[tuple(partial["pair"])], partial)
+    return build_report(names, list(results.values()))
+
+
+def build_report(names, pair_results):
+    tick_seconds = 1 / config.SIM_TICK_RATE
+    characters = {name: {"matches": 0, "wins": 0, "losses": 0, "draws": 0, "seconds": 0.0, "moves": {}} for name in names}
+    pairings = []
+    for result in pair_results:
+        name_a, name_b = result["pair"]
+        matches = result["matches"]
+        pairings.append({
+            "pair": [name_a, name_b], "matches": matches, "draws": result["draws"],
+            "win_rate": {name: (result["wins"][name] / matches if matches else 0.0) for name in (name_a, name_b)},
+            "avg_match_seconds": (result["ticks"] * tick_seconds / matches if matches else 0.0)
+        })
+        for name, rival in ((name_a, name_b), (name_b, name_a)):
+            summary = characters[name]
+            summary["matches"] += matches; summary["draws"] += result["draws"]
+            summary["wins"] += result["wins"][name]; summary["losses"] += result["wins"][rival]
+            summary["seconds"] += result["ticks"] * tick_seconds
+            for key, (uses, hits, damage) in result["moves"][name].items():
+                entry = summary["moves"].setdefault(key, [0, 0, 0])
+                entry[0] += uses; entry[1] += hits; entry[2] += damage
+    for name, summary in characters.items():
+        summary["win_rate"] = summary["wins"] / summary["matches"] if summary["matches"] else 0.0
+        seconds = summary["seconds"]
+        summary["moves"] = {
+            key: {"uses": uses, "hits": hits, "damage": damage,
+                  "hit_rate": hits / uses if uses else 0.0,
+                  "dps": damage / seconds if seconds else 0.0}
+            for key, (uses, hits, damage) in summary["moves"].items()
+        }
+    return {"tick_rate": config.SIM_TICK_RATE, "pairings": pairings, "characters": characters}
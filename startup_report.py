@@ -0,0 +1,76 @@
+# startup_report.py
+# Informe del tiempo de arranque: ejecuta las importaciones de cada etapa en
+# un intérprete nuevo con 'python -X importtime' y resume su salida (total,
+# módulos más lentos y tiempo propio por paquete). Etapas:
+#   login: lo que carga main.py antes de mostrar la pantalla de inicio de sesión
+#   game:  lo que se añade al entrar al juego (import game)
+#   python startup_report.py [--stage login|game|all] [--top N] [--runs N]
+import os
+import sys
+import argparse
+import subprocess
+from collections import defaultdict
+
+STAGES = {
+    "login": ("", "import main"),
+    "game": ("import main", "import game"),
+}
+_MARKER = "--- startup_report ---"
+
+def parse_importtime(lines):
+    # Filas (nombre, propio_us, acumulado_us) en el orden en que terminan.
+    rows = []
+    for line in lines:
+        if not line.startswith("import time:"): continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit(): continue  # cabecera
+        rows.append((fields[2].strip(), int(fields[0]), int(fields[1])))
+    return rows
+
+def measure(stage):
+    # Solo cuenta lo que importa 'stage' después de lo que ya cargaron las etapas anteriores.
+    setup, code = STAGES[stage]
+    script = f"{setup}\nimport sys; print({_MARKER!r}, file=sys.stderr, flush=True)\n{code}"
+    root = os.path.dirname(os.path.abspath(__file__))
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", script], cwd=root,
+                          capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f"código {proc.returncode}")
+    lines = proc.stderr.splitlines()
+    return parse_importtime(lines[lines.index(_MARKER) + 1:])
+
+def merge_runs(runs):
+    # Mediana por módulo entre varias ejecuciones (la primera suele ir más lenta por la caché de disco).
+    by_name = defaultdict(list)
+    for rows in runs:
+        for name, self_us, cumulative_us in rows: by_name[name].append((self_us, cumulative_us))
+    median = lambda values: sorted(values)[len(values) // 2]
+    return [(name, median([v[0] for v in values]), median([v[1] for v in values])) for name, values in by_name.items()]
+
+def report(stage, rows, top):
+    total = sum(self_us for _, self_us, _ in rows)
+    print(f"\n=== {stage}: {total / 1000:.1f} ms en {len(rows)} módulos ===")
+    print(f"  {'acumulado':>10} {'propio':>8}  módulo (más lentos incluyendo lo que importan)")
+    for name, self_us, cumulative_us in sorted(rows, key=lambda r: r[2], reverse=True)[:top]:
+        print(f"  {cumulative_us / 1000:8.1f}ms {self_us / 1000:6.1f}ms  {name}")
+    packages = defaultdict(int)
+    for name, self_us, _ in rows: packages[name.split(".")[0]] += self_us
+    print(f"  {'propio':>10} {'%':>6}  paquete")
+    for package, self_us in sorted(packages.items(), key=lambda p: p[1], reverse=True)[:top]:
+        print(f"  {self_us / 1000:8.1f}ms {100 * self_us / total if total else 0:5.1f}%  {package}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiempo de importación de cada etapa del arranque (python -X importtime).")
+    parser.add_argument("--stage", choices=list(STAGES) + ["all"], default="all")
+    parser.add_argument("--top", type=int, default=15, help="filas por tabla")
+    parser.add_argument("--runs", type=int, default=3, help="ejecuciones por etapa (se usa la mediana)")
+    args = parser.parse_args()
+    stages = list(STAGES) if args.stage == "all" else [args.stage]
+    for stage in stages:
+        try: rows = merge_runs([measure(stage) for _ in range(max(1, args.runs))])
+        except RuntimeError as e:
+            print(f"{stage}: error al importar: {e}"); sys.exit(1)
+        report(stage, rows, args.top)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,508 @@
+# storage.py
+import os
+import json
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import config
+
+# ==============================================================================
+# ESCRITURA ATÓMICA
+# ==============================================================================
+def atomic_write_bytes(file_path, data):
+    # Se escribe a un temporal en la misma carpeta y se renombra: un cierre
+    # inesperado a mitad de escritura nunca deja el archivo original truncado.
+    dir_name = os.path.dirname(os.path.abspath(file_path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.tmp_', dir=dir_name)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush(); os.fsync(f.fileno())
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path): os.remove(tmp_path)
+        raise
+
+def atomic_write_text(file_path, text):
+    atomic_write_bytes(file_path, text.encode('utf-8'))
+
+def atomic_write_json(file_path, data, indent=4):
+    atomic_write_text(file_path, json.dumps(data, indent=indent, ensure_ascii=False))
+
+def read_json_file(file_path, default_data):
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f: return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError): return default_data
+
+# ==============================================================================
+# ALMACÉN EN MEMORIA CON ESCRITURA DIFERIDA
+# ==============================================================================
+class _PeriodicFlush:
+    # Volcado periódico desde el bucle del juego: se encola en el hilo escritor
+    # (nunca se escribe en el hilo de render) y, mientras haya uno pendiente,
+    # no se encola otro. Los errores los informa el hilo escritor.
+    _flush_queued = False
+
+    def schedule_flush_if_due(self):
+        if self._flush_queued or not self.dirty: return False
+        if (time.monotonic() - self._last_flush) * 1000 < self.flush_interval: return False
+        self._flush_queued = True
+        run_in_writer(self._queued_flush)
+        return True
+
+    def _queued_flush(self):
+        try: self.flush()
+        finally: self._flush_queued = False
+
+
+class WriteBehindStore(_PeriodicFlush):
+    def __init__(self, file_path, flush_interval=config.STATE_FLUSH_INTERVAL):
+        self.file_path = file_path
+        self.flush_interval = flush_interval
+        self._data = None
+        self._dirty = False
+        self._last_flush = time.monotonic()
+        self._lock = threading.RLock()
+        self._write_lock = threading.Lock()
+
+    def _ensure_loaded(self):
+        if self._data is None: self._data = read_json_file(self.file_path, {})
+
+    def get(self, key, default=None):
+        with self._lock:
+            self._ensure_loaded()
+            return self._data.get(key, default)
+
+    def set(self, key, value):
+        with self._lock:
+            self._ensure_loaded()
+            if self._data.get(key) != value:
+                self._data[key] = value; self._dirty = True
+
+    def setdefault(self, key, value):
+        with self._lock:
+            self._ensure_loaded()
+            if key not in self._data:
+                self._data[key] = value; self._dirty = True
+            return self._data[key]
+
+    @property
+    def dirty(self):
+        return self._dirty
+
+    def flush(self):
+        # Se serializa bajo el candado y se escribe fuera de él, así flush()
+        # puede correr en el hilo escritor sin frenar al bucle principal.
+        with self._write_lock:
+            with self._lock:
+                self._last_flush = time.monotonic()
+                if not self._dirty: return False
+                text = json.dumps(self._data, indent=4, ensure_ascii=False)
+                self._dirty = False
+            try:
+                atomic_write_text(self.file_path, text)
+            except OSError:
+                self._dirty = True
+                raise
+            return True
+
+# ==============================================================================
+# BACKENDS DE ALMACENAMIENTO
+# ==============================================================================
+# Ambos backends exponen la misma interfaz. Los usuarios se guardan en dos
+# fases: prepare_users() toma una instantánea bajo el candado del repositorio
+# y write_users() la escribe fuera de él.
+class JsonBackend:
+    name = 'json'
+
+    def load_users(self):
+        return read_json_file(config.USERS_FILE, {})
+
+    def prepare_users(self, users, dirty, deleted):
+        return json.dumps(users, indent=4, ensure_ascii=False)
+
+    def write_users(self, prepared, battle_records=()):
+        # Con JSON son dos reemplazos atómicos por separado (usuarios y luego
+        # historial), no una transacción: si el segundo falla los usuarios ya
+        # están guardados y UserRepository reintenta solo lo que quedó pendiente.
+        # El historial solo se modifica desde el hilo escritor (ver
+        # game.change_battle_history), así que nadie lo reescribe entre medias.
+        if prepared is not None: atomic_write_text(config.USERS_FILE, prepared)
+        if battle_records:
+            history = self.load_battle_history()
+            history[:0] = reversed(battle_records)
+            self.save_battle_history(history[:config.BATTLE_HISTORY_LIMIT])
+
+    def load_characters(self):
+        return read_json_file(config.CHARACTERS_FILE, {})
+
+    def save_characters(self, characters):
+        atomic_write_json(config.CHARACTERS_FILE, characters)
+
+    def load_missions(self):
+        return read_json_file(config.MISSIONS_FILE, {})
+
+    def save_missions(self, missions):
+        atomic_write_json(config.MISSIONS_FILE, missions)
+
+    def load_battle_history(self):
+        return read_json_file(config.BATTLE_HISTORY_FILE, [])
+
+    def save_battle_history(self, history):
+        atomic_write_json(config.BATTLE_HISTORY_FILE, history)
+
+    def close(self):
+        pass
+
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    password TEXT NOT NULL,
+    correo TEXT,
+    character_class TEXT,
+    currency INTEGER NOT NULL DEFAULT 0,
+    missions_updated TEXT,
+    extra TEXT NOT NULL DEFAULT '{}'
+);
+CREATE TABLE IF NOT EXISTS ranked_stats (
+    username TEXT PRIMARY KEY REFERENCES users(username) ON DELETE CASCADE,
+    league_points INTEGER NOT NULL DEFAULT 0,
+    rank TEXT NOT NULL DEFAULT 'Bronce'
+);
+CREATE INDEX IF NOT EXISTS idx_ranked_stats_lp ON ranked_stats(league_points DESC);
+CREATE TABLE IF NOT EXISTS daily_missions (
+    username TEXT NOT NULL REFERENCES users(username) ON DELETE CASCADE,
+    slot INTEGER NOT NULL,
+    mission_id TEXT NOT NULL,
+    progress INTEGER NOT NULL DEFAULT 0,
+    completed INTEGER NOT NULL DEFAULT 0,
+    claimed INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (username, slot)
+);
+CREATE INDEX IF NOT EXISTS idx_daily_missions_mission ON daily_missions(mission_id);
+CREATE TABLE IF NOT EXISTS battle_records (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    p1_char TEXT,
+    p2_char TEXT,
+    winner TEXT,
+    replay TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_battle_records_timestamp ON battle_records(timestamp);
+CREATE INDEX IF NOT EXISTS idx_battle_records_winner ON battle_records(winner);
+CREATE TABLE IF NOT EXISTS missions (
+    mission_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS characters (
+    name TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+"""
+
+# Campos del usuario con columna o tabla propia; el resto va a 'extra'.
+_USER_COLUMNS = ('password', 'correo', 'character_class', 'currency', 'daily_missions', 'ranked_stats')
+
+class SQLiteBackend:
+    name = 'sqlite'
+
+    def __init__(self, db_path):
+        # La base se abre en la primera consulta, no al crear el backend: auth
+        # lo crea al importarse, antes de que main.py cambie a la carpeta del
+        # juego, y una ruta relativa apuntaría a otra carpeta.
+        self.db_path = db_path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        # Siempre con self._lock tomado.
+        if self._conn is None:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA foreign_keys=ON')
+            conn.executescript(SQLITE_SCHEMA)
+            # Bases creadas antes de que existieran las repeticiones.
+            columns = {row[1] for row in conn.execute('PRAGMA table_info(battle_records)')}
+            if 'replay' not in columns: conn.execute('ALTER TABLE battle_records ADD COLUMN replay TEXT')
+            self._conn = conn
+        return self._conn
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            conn = self._connection()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield conn
+            except BaseException:
+                conn.execute('ROLLBACK'); raise
+            conn.execute('COMMIT')
+
+    def _query(self, sql, params=()):
+        with self._lock: return self._connection().execute(sql, params).fetchall()
+
+    # --- Usuarios ---
+    def load_users(self):
+        users = {}
+        for username, password, correo, char_class, currency, missions_updated, extra in self._query(
+                'SELECT username, password, correo, character_class, currency, missions_updated, extra FROM users ORDER BY rowid'):
+            record = {'password': password, 'character_class': char_class, 'currency': currency}
+            if correo is not None: record['correo'] = correo
+            record.update(json.loads(extra))
+            record['daily_missions'] = {'last_updated': missions_updated or '1970-01-01', 'missions': []}
+            users[username] = record
+        for username, lp, rank in self._query('SELECT username, league_points, rank FROM ranked_stats'):
+            if username in users: users[username]['ranked_stats'] = {'league_points': lp, 'rank': rank}
+        for username, mission_id, progress, completed, claimed in self._query(
+                'SELECT username, mission_id, progress, completed, claimed FROM daily_missions ORDER BY username, slot'):
+            if username in users:
+                users[username]['daily_missions']['missions'].append({"id": mission_id, "progress": progress, "completed": bool(completed), "claimed": bool(claimed)})
+        return users
+
+    @staticmethod
+    def _user_rows(username, record):
+        daily = record.get('daily_missions', {})
+        extra = {k: v for k, v in record.items() if k not in _USER_COLUMNS}
+        user_row = (username, record.get('password', ''), record.get('correo'), record.get('character_class'),
+                    record.get('currency', 0), daily.get('last_updated'), json.dumps(extra, ensure_ascii=False))
+        ranked = record.get('ranked_stats')
+        ranked_row = (username, ranked.get('league_points', 0), ranked.get('rank', 'Bronce')) if ranked is not None else None
+        mission_rows = [(username, slot, m['id'], m.get('progress', 0), int(m.get('completed', False)), int(m.get('claimed', False)))
+                        for slot, m in enumerate(daily.get('missions', []))]
+        return user_row, ranked_row, mission_rows
+
+    def prepare_users(self, users, dirty, deleted):
+        return [self._user_rows(name, users[name]) for name in dirty if name in users], list(deleted)
+
+    def write_users(self, prepared, battle_records=()):
+        upserts, deleted = prepared if prepared is not None else ([], [])
+        with self._transaction() as conn:
+            conn.executemany('DELETE FROM users WHERE username = ?', [(name,) for name in deleted])
+            for user_row, ranked_row, mission_rows in upserts:
+                self._upsert_user(conn, user_row, ranked_row, mission_rows)
+            for record in battle_records: self._insert_battle_record(conn, record)
+
+    @staticmethod
+    def _upsert_user(conn, user_row, ranked_row, mission_rows):
+        username = user_row[0]
+        conn.execute("""INSERT INTO users (username, password, correo, character_class, currency, missions_updated, extra)
+                        VALUES (?, ?, ?, ?, ?, ?, ?)
+                        ON CONFLICT(username) DO UPDATE SET password=excluded.password, correo=excluded.correo,
+                        character_class=excluded.character_class, currency=excluded.currency,
+                        missions_updated=excluded.missions_updated, extra=excluded.extra""", user_row)
+        if ranked_row is not None:
+            conn.execute("""INSERT INTO ranked_stats (username, league_points, rank) VALUES (?, ?, ?)
+                            ON CONFLICT(username) DO UPDATE SET league_points=excluded.league_points, rank=excluded.rank""", ranked_row)
+        else:
+            conn.execute('DELETE FROM ranked_stats WHERE username = ?', (username,))
+        conn.execute('DELETE FROM daily_missions WHERE username = ? AND slot >= ?', (username, len(mission_rows)))
+        conn.executemany("""INSERT INTO daily_missions (username, slot, mission_id, progress, completed, claimed) VALUES (?, ?, ?, ?, ?, ?)
+                            ON CONFLICT(username, slot) DO UPDATE SET mission_id=excluded.mission_id, progress=excluded.progress,
+                            completed=excluded.completed, claimed=excluded.claimed""", mission_rows)
+
+    # --- Personajes y misiones ---
+    def load_characters(self):
+        return {name: json.loads(data) for name, data in self._query('SELECT name, data FROM characters ORDER BY position')}
+
+    def save_characters(self, characters):
+        with self._transaction() as conn:
+            conn.execute('DELETE FROM characters')
+            conn.executemany('INSERT INTO characters (name, position, data) VALUES (?, ?, ?)',
+                             [(name, i, json.dumps(data, ensure_ascii=False)) for i, (name, data) in enumerate(characters.items())])
+
+    def load_missions(self):
+        return {mid: json.loads(data) for mid, data in self._query('SELECT mission_id, data FROM missions ORDER BY rowid')}
+
+    def save_missions(self, missions):
+        with self._transaction() as conn:
+            conn.execute('DELETE FROM missions')
+            conn.executemany('INSERT INTO missions (mission_id, data) VALUES (?, ?)',
+                             [(mid, json.dumps(data, ensure_ascii=False)) for mid, data in missions.items()])
+
+    # --- Historial de batallas ---
+    def load_battle_history(self):
+        rows = self._query('SELECT timestamp, p1_char, p2_char, winner, replay FROM battle_records ORDER BY id DESC LIMIT ?', (config.BATTLE_HISTORY_LIMIT,))
+        history = []
+        for t, p1, p2, w, replay in rows:
+            record = {"timestamp": t, "p1_char": p1, "p2_char": p2, "winner": w}
+            if replay is not None: record["replay"] = replay
+            history.append(record)
+        return history
+
+    def save_battle_history(self, history):
+        # El historial se guarda del más nuevo al más viejo; se inserta al revés
+        # para que el id creciente conserve ese orden.
+        with self._transaction() as conn:
+            conn.execute('DELETE FROM battle_records')
+            conn.executemany('INSERT INTO battle_records (timestamp, p1_char, p2_char, winner, replay) VALUES (?, ?, ?, ?, ?)',
+                             [(r.get('timestamp', ''), r.get('p1_char'), r.get('p2_char'), r.get('winner'), r.get('replay')) for r in reversed(history)])
+
+    @staticmethod
+    def _insert_battle_record(conn, record):
+        conn.execute('INSERT INTO battle_records (timestamp, p1_char, p2_char, winner, replay) VALUES (?, ?, ?, ?, ?)',
+                     (record['timestamp'], record['p1_char'], record['p2_char'], record['winner'], record.get('replay')))
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None: self._conn.close(); self._conn = None
+
+
+_backend = None
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        if config.STORAGE_BACKEND == 'sqlite': _backend = SQLiteBackend(config.SQLITE_DB_FILE)
+        else: _backend = JsonBackend()
+    return _backend
+
+def migrate_json_to_sqlite(db_path=config.SQLITE_DB_FILE):
+    source, target = JsonBackend(), SQLiteBackend(db_path)
+    try:
+        users = source.load_users()
+        target.write_users(target.prepare_users(users, users.keys(), ()))
+        target.save_characters(source.load_characters())
+        target.save_missions(source.load_missions())
+        target.save_battle_history(source.load_battle_history())
+        return len(users)
+    finally:
+        target.close()
+
+# ==============================================================================
+# REPOSITORIO DE USUARIOS
+# ==============================================================================
+class UserRepository(_PeriodicFlush):
+    # Carga los usuarios una sola vez y sirve lecturas desde memoria. Las
+    # modificaciones se hacen por usuario con edit(); los registros tocados
+    # quedan marcados y se escriben juntos en un único volcado.
+    def __init__(self, backend, flush_interval=config.STATE_FLUSH_INTERVAL):
+        self.backend = backend
+        self.flush_interval = flush_interval
+        self._users = None
+        self._names = None
+        self._dirty = set()
+        self._deleted = set()
+        self._pending_battles = []  # registros de batalla aún sin escribir (se reintentan)
+        self._last_flush = time.monotonic()
+        self._lock = threading.RLock()
+        self._write_lock = threading.Lock()
+
+    def _ensure_loaded(self):
+        if self._users is None: self._users = self.backend.load_users()
+        return self._users
+
+    def get(self, username):
+        with self._lock: return self._ensure_loaded().get(username)
+
+    def exists(self, username):
+        with self._lock: return username in self._ensure_loaded()
+
+    def usernames(self):
+        with self._lock:
+            if self._names is None: self._names = list(self._ensure_loaded().keys())
+            return self._names
+
+    def items(self):
+        with self._lock: return list(self._ensure_loaded().items())
+
+    def add(self, username, record):
+        with self._lock:
+            users = self._ensure_loaded()
+            if username in users: return False
+            users[username] = record
+            self._dirty.add(username); self._deleted.discard(username); self._names = None
+            return True
+
+    def delete(self, username):
+        with self._lock:
+            users = self._ensure_loaded()
+            if username not in users: return False
+            del users[username]
+            self._deleted.add(username); self._dirty.discard(username); self._names = None
+            return True
+
+    @contextmanager
+    def edit(self, username):
+        # Entrega el registro vivo del usuario (o None si no existe) y lo marca
+        # como modificado al salir del bloque, también si sale por una
+        # excepción: lo que se llegó a cambiar en memoria se guarda igual. No se
+        # trabaja sobre una copia porque el juego guarda referencias al registro.
+        with self._lock:
+            record = self._ensure_loaded().get(username)
+            try: yield record
+            finally:
+                if record is not None: self._dirty.add(username)
+
+    def mark_dirty(self, usernames):
+        # Fuerza a reescribir esos usuarios en el próximo volcado.
+        with self._lock:
+            users = self._ensure_loaded()
+            self._dirty.update(name for name in usernames if name in users)
+
+    @property
+    def dirty(self):
+        return bool(self._dirty or self._deleted or self._pending_battles)
+
+    def flush(self, battle_records=()):
+        # Un solo escritor a la vez; la instantánea se serializa bajo el candado
+        # para que las ediciones concurrentes no se mezclen con la escritura.
+        # Los registros de batalla indicados se guardan en la misma escritura;
+        # si falla, quedan pendientes igual que los usuarios modificados.
+        with self._write_lock:
+            with self._lock:
+                self._last_flush = time.monotonic()
+                battle_records = self._pending_battles + list(battle_records)
+                if not self._dirty and not self._deleted and not battle_records: return False
+                prepared = self.backend.prepare_users(self._users, self._dirty, self._deleted) if self._dirty or self._deleted else None
+                dirty, deleted = self._dirty, self._deleted
+                self._dirty, self._deleted, self._pending_battles = set(), set(), []
+            try:
+                self.backend.write_users(prepared, battle_records)
+            except (OSError, sqlite3.Error):
+                with self._lock:
+                    self._dirty |= dirty; self._deleted |= deleted
+                    self._pending_battles[:0] = battle_records
+                raise
+            return True
+
+
+# ==============================================================================
+# HILO ESCRITOR
+# ==============================================================================
+# Un único hilo hace las escrituras pesadas para que el bucle de render nunca
+# espere al disco. Las tareas se ejecutan en el orden en que se encolan.
+_writer = None
+
+def _report_write_error(future):
+    error = future.exception()
+    if error is not None: print(f"ADVERTENCIA: Falló una escritura en segundo plano: {error}")
+
+def run_in_writer(fn, *args, **kwargs):
+    global _writer
+    if _writer is None: _writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='storage-writer')
+    future = _writer.submit(fn, *args, **kwargs)
+    future.add_done_callback(_report_write_error)
+    return future
+
+def wait_for_writes():
+    global _writer
+    if _writer is not None:
+        _writer.shutdown(wait=True); _writer = None
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Herramientas de almacenamiento de DARKHI GAME')
+    sub = parser.add_subparsers(dest='command', required=True)
+    migrate = sub.add_parser('migrate', help='Copia los archivos JSON actuales a una base SQLite')
+    migrate.add_argument('--db', default=config.SQLITE_DB_FILE)
+    args = parser.parse_args()
+    if args.command == 'migrate':
+        count = migrate_json_to_sqlite(args.db)
+        print(f"Migración completa: {count} usuarios copiados a {args.db}.")
+        print("Cambia config.STORAGE_BACKEND a 'sqlite' para usarla.")
@@ -1,20 +1,157 @@
 # ui.py
 import pygame
+from collections import OrderedDict
 import config
+from profiler import profiler
+from render import TextureCanvas
+from background import AnimatedBackground
+
+# --- CACHÉ DE SUPERFICIES ESCALADAS ---
+# Copias escaladas por (imagen, tamaño), ya convertidas al formato de la
+# pantalla para que el blit use la ruta rápida. Se vacía al cambiar resolución.
+_scaled_surfaces = {}
+
+def get_scaled_surface(image, size, opaque=True):
+    size = (int(size[0]), int(size[1]))
+    key = (image, size)
+    scaled = _scaled_surfaces.get(key)
+    if scaled is None:
+        if len(_scaled_surfaces) >= config.SURFACE_CACHE_LIMIT: _scaled_surfaces.clear()
+        scaled = pygame.transform.scale(image, size)
+        scaled = scaled.convert() if opaque else scaled.convert_alpha()
+        _scaled_surfaces[key] = scaled
+    return scaled
+
+def clear_surface_cache():
+    _scaled_surfaces.clear()
+
+# --- REGIONES SUCIAS ---
+class DirtyRegions:
+    # Compara cada frame con el último enviado a pantalla por franjas
+    # horizontales y devuelve solo las que cambiaron, para usar
+    # pygame.display.update(rects) en escenas casi estáticas.
+    def __init__(self, band_height=config.DIRTY_BAND_HEIGHT):
+        self.band_height = band_height
+        self._last, self._last_size = None, None
+
+    def reset(self):
+        # El siguiente frame se envía entero (cambio de escena, ventana expuesta...).
+        self._last = None
+
+    def changed_rects(self, surface):
+        width, height = surface.get_size()
+        pixels = surface.get_buffer().raw
+        last, self._last = self._last, pixels
+        if last is None or self._last_size != (width, height):
+            self._last_size = (width, height)
+            return [surface.get_rect()]
+        pitch, rects = surface.get_pitch(), []
+        for y in range(0, height, self.band_height):
+            start, end = y * pitch, min(height, y + self.band_height) * pitch
+            if pixels[start:end] == last[start:end]: continue
+            if rects and rects[-1].bottom == y: rects[-1].height += min(self.band_height, height - y)
+            else: rects.append(pygame.Rect(0, y, width, min(self.band_height, height - y)))
+        return rects
+
+# --- FUENTES Y CACHÉ DE TEXTO ---
+# Cada fuente se crea una sola vez (SysFont recorre las fuentes del sistema).
+# Los textos renderizados se guardan por (fuente, texto, color) en una caché
+# LRU limitada por la memoria de las superficies.
+_fonts = {}
+_text_surfaces = OrderedDict()
+_text_cache_bytes = 0
+
+def get_font(size, path=None, bold=False):
+    key = (path, size, bold)
+    font = _fonts.get(key)
+    if font is None:
+        if path is None: font = pygame.font.SysFont(None, size, bold=bold)
+        else:
+            font = pygame.font.Font(path, size); font.set_bold(bold)
+        _fonts[key] = font
+    return font
+
+def render_text(font, text, color):
+    global _text_cache_bytes
+    key = (font, text, tuple(color))
+    img = _text_surfaces.get(key)
+    if img is not None:
+        _text_surfaces.move_to_end(key)
+        return img
+    img = font.render(text, True, color)
+    _text_surfaces[key] = img
+    _text_cache_bytes += img.get_width() * img.get_height() * img.get_bytesize()
+    while _text_cache_bytes > config.TEXT_CACHE_MAX_BYTES and len(_text_surfaces) > 1:
+        _, old = _text_surfaces.popitem(last=False)
+        _text_cache_bytes -= old.get_width() * old.get_height() * old.get_bytesize()
+    return img
 
 def draw_text(surface, text, font, text_col, x, y):
-    img = font.render(text, True, text_col)
-    surface.blit(img, (x, y))
+    surface.blit(render_text(font, text, text_col), (x, y))
 
 def draw_bg(surface, bg_image):
-    scaled_bg = pygame.transform.scale(bg_image, (surface.get_width(), surface.get_height()))
-    surface.blit(scaled_bg, (0, 0))
+    with profiler.phase('draw_bg'):
+        if isinstance(bg_image, AnimatedBackground):
+            # Los frames ya vienen escalados; hasta que llega el primero se
+            # dibuja el frame inicial como un fondo normal.
+            frame = bg_image.frame(surface.get_size())
+            if frame.get_size() == surface.get_size():
+                if isinstance(surface, TextureCanvas): surface.blit_streamed(frame, surface.get_rect())
+                else: surface.blit(frame, (0, 0))
+                return
+            bg_image = frame
+        # Con texturas el fondo original se escala al dibujar.
+        if isinstance(surface, TextureCanvas): surface.blit_scaled(bg_image, surface.get_rect())
+        else: surface.blit(get_scaled_surface(bg_image, surface.get_size()), (0, 0))
+
+def draw_sprite(surface, image, flipped_image, flip, pos):
+    if isinstance(surface, TextureCanvas): surface.blit_sprite(image, flipped_image, flip, pos)
+    else: surface.blit(flipped_image if flip else image, pos)
+
+_projectile_images = {}
+
+def get_projectile_image(radius):
+    image = _projectile_images.get(radius)
+    if image is None:
+        image = pygame.Surface((radius * 2 + 1, radius * 2 + 1), pygame.SRCALPHA)
+        pygame.draw.circle(image, (255, 140, 0), (radius, radius), radius)
+        pygame.draw.circle(image, config.YELLOW, (radius, radius), max(1, radius // 2))
+        _projectile_images[radius] = image
+    return image
+
+def draw_projectile(surface, projectile, alpha=1.0):
+    # Bola de energía interpolada entre el tick anterior y el actual.
+    x, y, width, height = projectile.box
+    x = projectile.prev_x + (x - projectile.prev_x) * alpha
+    center, radius = (int(x + width / 2), int(y + height / 2)), max(2, min(width, height) // 2)
+    surface.blit(get_projectile_image(radius), (center[0] - radius, center[1] - radius))
 
 def draw_health_bar(surface, health, x, y):
     ratio = health / 100
-    pygame.draw.rect(surface, config.WHITE, (x - 2, y - 2, 404, 34))
-    pygame.draw.rect(surface, config.RED, (x, y, 400, 30))
-    pygame.draw.rect(surface, config.YELLOW, (x, y, 400 * ratio, 30))
+    surface.fill(config.WHITE, (x - 2, y - 2, 404, 34))
+    surface.fill(config.RED, (x, y, 400, 30))
+    surface.fill(config.YELLOW, (x, y, 400 * ratio, 30))
+
+def draw_loading_indicator(surface, font, progress, x=None, y=None):
+    # Barra de progreso de la precarga; por defecto centrada abajo.
+    if x is None: x = surface.get_width() / 2 - 150
+    if y is None: y = surface.get_height() - 60
+    pygame.draw.rect(surface, config.WHITE, (x - 2, y - 2, 304, 24), 2)
+    pygame.draw.rect(surface, config.HIGHLIGHT, (x, y, 300 * progress, 20))
+    draw_text(surface, f"Cargando... {int(progress * 100)}%", font, config.WHITE, x, y - 40)
+
+def draw_profiler_overlay(surface, font, summary, x=10, y=10):
+    # Tiempos de frame (p50/p95/p99) y media por fase en ms, sobre un panel
+    # semitransparente en la esquina.
+    lines = ["Perfilador: midiendo..."] if summary is None else [
+        f"{summary['fps']:.0f} FPS  p50 {summary['p50']:.1f}  p95 {summary['p95']:.1f}  p99 {summary['p99']:.1f}  máx {summary['max']:.1f} ms"]
+    if summary: lines += [f"{name:<24}{ms:>7.2f} ms" for name, ms in summary['phases'][:12]]
+    lines.append("F3: ocultar | F4: exportar traza")
+    line_h = font.get_linesize()
+    panel = pygame.Surface((max(font.size(line)[0] for line in lines) + 16, line_h * len(lines) + 12), pygame.SRCALPHA)
+    panel.fill((0, 0, 0, 170))
+    surface.blit(panel, (x, y))
+    for i, line in enumerate(lines): draw_text(surface, line, font, config.YELLOW if i == 0 else config.WHITE, x + 8, y + 6 + i * line_h)
 
 def draw_menu(surface, font, menu_items, selected_idx):
     surface.fill((30, 30, 30))
@@ -34,7 +171,7 @@ def draw_ajustes(surface, font, option_items, selected_idx, values):
 def draw_profile_screen(surface, title_font, menu_font, username, stats, play_time_str, char_image):
     draw_text(surface, f"Perfil de {username}", title_font, config.WHITE, 50, 40)
     if char_image:
-        char_image_scaled = pygame.transform.scale(char_image, (char_image.get_width() * 1.5, char_image.get_height() * 1.5))
+        char_image_scaled = get_scaled_surface(char_image, (char_image.get_width() * 1.5, char_image.get_height() * 1.5), opaque=False)
         char_rect = char_image_scaled.get_rect(center=(surface.get_width() * 0.75, surface.get_height() / 2))
         surface.blit(char_image_scaled, char_rect)
         pygame.draw.rect(surface, config.HIGHLIGHT, char_rect.inflate(10, 10), 3)
@@ -50,7 +187,7 @@ def draw_profile_screen(surface, title_font, menu_font, username, stats, play_ti
         draw_text(surface, f"{label}:", menu_font, config.WHITE, 60, y_pos)
         draw_text(surface, str(value), menu_font, config.YELLOW, 350, y_pos)
         y_pos += 60
-    draw_text(surface, "Presiona ESC o ENTER para volver", pygame.font.SysFont(None, 36), config.GRAY, 50, surface.get_height() - 80)
+    draw_text(surface, "Presiona ESC o ENTER para volver", get_font(36), config.GRAY, 50, surface.get_height() - 80)
 
 def draw_daily_missions(surface, bg_image, font, title_font, missions_with_details, selected_idx, user_currency):
     draw_bg(surface, bg_image)
@@ -75,7 +212,7 @@ def draw_daily_missions(surface, bg_image, font, title_font, missions_with_detai
         y_pos += 100
 
 def draw_round_over_menu(surface, font, round_options, selected_idx, image_to_show, lp_change=0):
-    scaled_image = pygame.transform.scale(image_to_show, (300, 150))
+    scaled_image = get_scaled_surface(image_to_show, (300, 150), opaque=False)
     surface.blit(scaled_image, (surface.get_width() / 2 - 150, 100))
     if lp_change != 0:
         sign = "+" if lp_change > 0 else ""; color = (0, 255, 0) if lp_change > 0 else config.RED
@@ -85,10 +222,10 @@ def draw_round_over_menu(surface, font, round_options, selected_idx, image_to_sh
         color = config.HIGHLIGHT if i == selected_idx else config.WHITE
         draw_text(surface, item, font, color, surface.get_width() / 2 - 100, 320 + i * 60)
 
-def draw_leaderboard(surface, title_font, menu_font, players):
+def draw_leaderboard(surface, title_font, menu_font, players, player_position=None):
     surface.fill((20, 20, 40))
     draw_text(surface, "Tabla de Clasificación", title_font, config.WHITE, 50, 40)
-    header_font = pygame.font.SysFont(None, 42, bold=True)
+    header_font = get_font(42, bold=True)
     draw_text(surface, "Rango", header_font, config.YELLOW, 50, 120)
     draw_text(surface, "Jugador", header_font, config.YELLOW, 250, 120)
     draw_text(surface, "Puntos (LP)", header_font, config.YELLOW, 550, 120)
@@ -99,11 +236,13 @@ def draw_leaderboard(surface, title_font, menu_font, players):
         draw_text(surface, player['name'], menu_font, config.WHITE, 250, y_pos)
         draw_text(surface, str(player['lp']), menu_font, config.WHITE, 550, y_pos)
         y_pos += 50
-    draw_text(surface, "Presiona ESC o ENTER para volver", pygame.font.SysFont(None, 36), config.GRAY, 50, surface.get_height() - 80)
+    if player_position is not None:
+        draw_text(surface, f"Tu posición: #{player_position}", menu_font, config.HIGHLIGHT, 50, surface.get_height() - 140)
+    draw_text(surface, "Presiona ESC o ENTER para volver", get_font(36), config.GRAY, 50, surface.get_height() - 80)
 
 def draw_map_select(surface, title_font, menu_font, maps, thumbnails, selected_idx):
     draw_bg(surface, thumbnails[list(maps.keys())[selected_idx]])
-    title_surf = title_font.render("Selecciona un Mapa", True, config.WHITE)
+    title_surf = render_text(title_font, "Selecciona un Mapa", config.WHITE)
     pygame.draw.rect(surface, config.BLACK, (0, 40, surface.get_width(), 100), 0)
     surface.blit(title_surf, (surface.get_width()/2 - title_surf.get_width()/2, 60))
     map_keys = list(maps.keys())
@@ -111,12 +250,12 @@ def draw_map_select(surface, title_font, menu_font, maps, thumbnails, selected_i
         color = config.HIGHLIGHT if i == selected_idx else config.WHITE
         x_pos = (surface.get_width() // (len(map_keys) + 1)) * (i + 1)
         y_pos = surface.get_height() - 100
-        thumbnail_img = pygame.transform.scale(thumbnails[map_name], (220, 165))
+        thumbnail_img = get_scaled_surface(thumbnails[map_name], (220, 165))
         rect = thumbnail_img.get_rect(center=(x_pos, y_pos - 120))
         surface.blit(thumbnail_img, rect.topleft)
         if i == selected_idx:
             pygame.draw.rect(surface, config.HIGHLIGHT, rect.inflate(10, 10), 5)
-        text_surf = menu_font.render(map_name, True, color)
+        text_surf = render_text(menu_font, map_name, color)
         surface.blit(text_surf, (x_pos - text_surf.get_width() // 2, y_pos))
 
 def draw_character_crud(surface, bg_image, menu_font, title_font, char_names, crud_items, char_idx, opt_idx):
@@ -148,16 +287,19 @@ def draw_character_select(surface, bg_image, menu_font, title_font, char_names,
         draw_text(surface, name, menu_font, color, 100, 150 + i * 70)
     if preview_fighter:
         preview_fighter.draw(surface)
+    elif char_names:
+        draw_text(surface, "Cargando...", menu_font, config.GRAY, surface.get_width() * 0.6, surface.get_height() * 0.5)
 
 def draw_battle_history(surface, bg_image, font, title_font, history, selected_idx):
     draw_bg(surface, bg_image)
     draw_text(surface, "Historial de Batallas", title_font, config.WHITE, 50, 20)
-    instructions = "A: Añadir | E: Editar | SUPR: Borrar | SHIFT+D: Borrar todo"
+    instructions = "A: Añadir | E: Editar | R: Repetición | SUPR: Borrar | SHIFT+D: Borrar todo"
     draw_text(surface, instructions, font, config.YELLOW, 50, 80)
     for i, record in enumerate(history):
         if i > 15: break 
         color = config.HIGHLIGHT if i == selected_idx else config.WHITE
         text = f"{record['timestamp']} - {record['p1_char']} vs {record['p2_char']} - Ganador: {record['winner']}"
+        if record.get('replay'): text += "  [R]"
         draw_text(surface, text, font, color, 50, 140 + i * 35)
 
 def draw_user_crud_screen(surface, bg_image, menu_font, title_font, user_names, user_idx, opt_idx):
@@ -182,7 +324,7 @@ def draw_mission_crud_screen(surface, bg_image, menu_font, title_font, missions,
         color = config.HIGHLIGHT if i == mission_idx else config.WHITE
         text = f"{m_id}: {m_data['description'][:40]}"
         if len(m_data['description']) > 40: text += "..."
-        draw_text(surface, text, pygame.font.SysFont(None, 36), color, 100, y_pos)
+        draw_text(surface, text, get_font(36), color, 100, y_pos)
         y_pos += 40
     draw_text(surface, "Acciones:", menu_font, config.YELLOW, 600, 120)
     for i, opt in enumerate(config.MISSION_CRUD_ITEMS):